@@ -0,0 +1,280 @@
+"""Benchmarks of the blackjack hot paths with stored baselines.
+
+Every benchmark runs in process with a seeded shoe and no hardware, cameras or
+sockets. Results are compared against `benchmark_baseline.json`, and the run
+fails when any benchmark regresses by more than the allowed percentage.
+Rates are stored relative to a fixed pure Python calibration loop timed around
+each of them, so a baseline carries over between machines and the load
+of a shared machine largely cancels out; peak memory is stored in bytes. The
+file also records the machine and Python of the baseline, and a run on another
+Python version warns, since interpreter changes move the ratios.
+"""
+
+import argparse
+import functools
+import json
+import os
+import platform
+import sys
+import timeit
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from dealr.blackjack import cards, encoding
+from dealr.blackjack.game import BACKENDS, dealer_hand_value, make_dealer
+from dealr.blackjack.player import Player
+from dealr.blackjack.shoe import Shoe
+from dealr.blackjack.simulation import play_fsm_round
+
+BASELINE_PATH = Path(__file__).with_name("benchmark_baseline.json")
+PLAYER_COUNTS = (1, 4, 7)
+NUM_HANDS = 10_000  # random hands per pass of the hand value benchmarks
+CALIBRATION_STEPS = 200_000  # loop iterations per calibration pass
+
+
+@dataclass(frozen=True)
+class Benchmark:
+    """One measured quantity."""
+
+    name: str
+    unit: str
+    measure: Callable[[], float]
+    higher_is_better: bool = True
+    relative: bool = True  # stored relative to the calibration rate
+
+
+def _best_rate(func: Callable[[], object], items: int, repeat: int) -> float:
+    """Items per second of the fastest of `repeat` calls to `func`."""
+    best = min(timeit.repeat(func, number=1, repeat=repeat))
+    return items / best
+
+
+def _calibration_loop(steps: int = CALIBRATION_STEPS) -> int:
+    total = 0
+    for i in range(steps):
+        total += i * i % 7
+    return total
+
+
+def calibration_rate(repeat: int) -> float:
+    """Iterations per second of a fixed pure Python loop."""
+    return _best_rate(_calibration_loop, CALIBRATION_STEPS, repeat)
+
+
+def _random_hands(seed: int, num_hands: int = NUM_HANDS) -> list[list[cards.Card]]:
+    """Random two to five card hands from a seeded generator."""
+    rng = np.random.default_rng(seed)
+    sizes = rng.integers(2, 6, size=num_hands)
+    ids = rng.integers(0, encoding.NUM_CARDS, size=(num_hands, 5))
+    return [encoding.to_cards(row[:size].tolist()) for row, size in zip(ids, sizes)]
+
+
+def hand_value_rate(repeat: int) -> float:
+    """Plain card lists valued per second by `cards.hand_value`."""
+    hands = _random_hands(0)
+    return _best_rate(
+        lambda: [cards.hand_value(hand) for hand in hands], len(hands), repeat
+    )
+
+
+def tracked_hand_value_rate(repeat: int) -> float:
+    """`cards.Hand` objects valued per second by `cards.hand_value`."""
+    hands = [cards.Hand(hand) for hand in _random_hands(0)]
+    return _best_rate(
+        lambda: [cards.hand_value(hand) for hand in hands], len(hands), repeat
+    )
+
+
+def dealer_hand_value_rate(repeat: int) -> float:
+    """Plain card lists valued per second by `dealer_hand_value`."""
+    hands = _random_hands(1)
+    return _best_rate(
+        lambda: [dealer_hand_value(hand) for hand in hands], len(hands), repeat
+    )
+
+
+def player_churn_rate(repeat: int, num_players: int = 7) -> float:
+    """Seats of players created, dealt two cards and dropped per second."""
+    card_pairs = [hand[:2] for hand in _random_hands(2)]
+
+    def churn() -> None:
+        for pair in card_pairs:
+            for _ in range(num_players):
+                player = Player(bet=100)
+                player.hand.extend(pair)
+
+    return _best_rate(churn, len(card_pairs) * num_players, repeat)
+
+
+def _play_rounds(
+    shoe: Shoe, rounds: int, num_players: int, backend: str
+) -> Callable[[], None]:
+    def play() -> None:
+        for _ in range(rounds):
+            players = [Player(bet=100) for _ in range(num_players)]
+            play_fsm_round(make_dealer(players, shoe, backend))
+
+    return play
+
+
+def round_rate(num_players: int, backend: str, rounds: int, repeat: int) -> float:
+    """Full dealer rounds per second, players hitting below 17."""
+    shoe = Shoe(6, rng=np.random.default_rng(3))
+    return _best_rate(_play_rounds(shoe, rounds, num_players, backend), rounds, repeat)
+
+
+def round_peak_bytes(num_players: int, backend: str, rounds: int) -> float:
+    """Mean peak traced memory of one dealer round, in bytes."""
+    shoe = Shoe(6, rng=np.random.default_rng(4))
+    play = _play_rounds(shoe, 1, num_players, backend)
+    play()  # warm up class level caches
+    tracemalloc.start()
+    try:
+        total = 0
+        for _ in range(rounds):
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            play()
+            _, peak = tracemalloc.get_traced_memory()
+            total += peak - current
+    finally:
+        tracemalloc.stop()
+    return total / rounds
+
+
+def benchmarks(rounds: int = 2_000, repeat: int = 5) -> list[Benchmark]:
+    """Every benchmark in the suite.
+
+    Args:
+        rounds: Dealer rounds per timed pass.
+        repeat: Timed passes per benchmark, the fastest one counts.
+
+    Returns:
+        list[Benchmark]: Benchmarks in reporting order.
+    """
+    suite = [
+        Benchmark("hand_value", "hands/s", lambda: hand_value_rate(repeat)),
+        Benchmark(
+            "hand_value_tracked", "hands/s", lambda: tracked_hand_value_rate(repeat)
+        ),
+        Benchmark(
+            "dealer_hand_value", "hands/s", lambda: dealer_hand_value_rate(repeat)
+        ),
+        Benchmark("player_churn", "players/s", lambda: player_churn_rate(repeat)),
+    ]
+    for backend in BACKENDS:
+        for num_players in PLAYER_COUNTS:
+            suite.append(
+                Benchmark(
+                    f"rounds_{backend}_{num_players}p",
+                    "rounds/s",
+                    functools.partial(round_rate, num_players, backend, rounds, repeat),
+                )
+            )
+        for num_players in PLAYER_COUNTS:
+            suite.append(
+                Benchmark(
+                    f"peak_bytes_{backend}_{num_players}p",
+                    "bytes/round",
+                    functools.partial(round_peak_bytes, num_players, backend, rounds),
+                    higher_is_better=False,
+                    relative=False,
+                )
+            )
+    return suite
+
+
+def machine_info() -> dict[str, str]:
+    """Hardware and interpreter the results are measured on."""
+    return {
+        "system": platform.system(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": str(os.cpu_count()),
+        "python": f"{platform.python_implementation()} {platform.python_version()}",
+    }
+
+
+def regression(benchmark: Benchmark, value: float, baseline: float) -> float:
+    """Fraction by which a result is worse than its baseline, negative if better."""
+    change = (value - baseline) / baseline
+    return -change if benchmark.higher_is_better else change
+
+
+def main() -> None:
+    """Runs the suite and compares it with the stored baselines."""
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=20.0,
+        help="largest allowed regression in percent",
+    )
+    parser.add_argument("--rounds", type=int, default=2_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="+", help="names of benchmarks to run")
+    parser.add_argument(
+        "--update", action="store_true", help="store the results as the baseline"
+    )
+    args = parser.parse_args()
+
+    stored = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    baselines: dict[str, float] = stored.get("results", {})
+    machine = machine_info()
+    stored_python = stored.get("machine", {}).get("python")
+    other_python = bool(baselines) and stored_python != machine["python"]
+    if other_python:
+        print(
+            f"WARNING: baseline measured on {stored_python}, not "
+            f"{machine['python']}; ratios may have moved",
+            file=sys.stderr,
+        )
+    results: dict[str, float] = {}
+    failed = []
+    for benchmark in benchmarks(args.rounds, args.repeat):
+        if args.only and benchmark.name not in args.only:
+            continue
+        line = f"{benchmark.name:<28}"
+        if benchmark.relative:
+            before = calibration_rate(args.repeat)
+            rate = benchmark.measure()
+            value = rate / max(before, calibration_rate(args.repeat))
+            line += f"{rate:>14,.0f} {benchmark.unit:<12}{value:>10.4g}x"
+        else:
+            value = benchmark.measure()
+            line += f"{value:>14,.0f} {benchmark.unit:<12}{'':>11}"
+        results[benchmark.name] = float(f"{value:.5g}")
+        baseline = baselines.get(benchmark.name)
+        if baseline is not None:
+            worse = regression(benchmark, value, baseline)
+            line += f"  ({-worse:+.1%} vs {baseline:.5g})"
+            if worse * 100 > args.threshold:
+                line += "  REGRESSION"
+                failed.append(benchmark.name)
+        print(line, flush=True)
+
+    if args.update:
+        if other_python:  # ratios of another interpreter cannot be mixed in
+            baselines = {}
+        args.baseline.write_text(
+            json.dumps(
+                {"machine": machine, "results": baselines | results},
+                indent=4,
+                sort_keys=True,
+            )
+            + "\n"
+        )
+        print(f"Wrote {args.baseline}")
+    elif failed:
+        print(f"Regressed beyond {args.threshold}%: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 """Playing card class."""
 
+from collections.abc import Iterable
 from enum import IntEnum, StrEnum, auto
-from typing import NamedTuple
+from typing import Any, NamedTuple, SupportsIndex
+
+DEALER_LIMIT = 17
+BLACKJACK = 21
 
 
 class Suit(StrEnum):
@@ -50,6 +54,9 @@ def hand_value(hand: list[Card]) -> int:
     Returns:
         int: Blackjack card value.
     """
+    if isinstance(hand, Hand):
+        return hand.value
+
     value = 0
     for card in hand:
         if card.rank != Rank.ACE:
@@ -68,3 +75,114 @@ def hand_value(hand: list[Card]) -> int:
         if card.rank == Rank.ACE:
             value += 1 if value + 11 > 21 else 11
     return value
+
+
+# blackjack points of each rank with aces counted as 1
+POINTS = {rank: min(rank.value, 10) for rank in Rank}
+
+
+class Hand(list[Card]):
+    """List of cards that keeps its blackjack totals up to date.
+
+    Appending a card updates the totals in O(1), so `value` and `dealer_value`
+    never rescan the hand. Other in-place edits rebuild the totals.
+    """
+
+    def __init__(self, iterable: Iterable[Card] = ()) -> None:
+        super().__init__()
+        self.hard = 0
+        self.aces = 0
+        self.dealer_value = 0
+        self.extend(iterable)
+
+    def _add(self, card: Card) -> None:
+        if card.rank == Rank.ACE:
+            self.aces += 1
+            self.hard += 1
+            # same rule as game.dealer_hand_value
+            hard_eleven = DEALER_LIMIT < self.dealer_value + 11 < BLACKJACK
+            self.dealer_value += 11 if hard_eleven else 1
+        else:
+            self.hard += POINTS[card.rank]
+            self.dealer_value += POINTS[card.rank]
+
+    def _rebuild(self) -> None:
+        self.hard = 0
+        self.aces = 0
+        self.dealer_value = 0
+        for card in self:
+            self._add(card)
+
+    @property
+    def soft_aces(self) -> int:
+        """Number of aces counted as 11 by `hand_value`."""
+        return int(self.aces > 0 and self.hard - self.aces + 11 <= BLACKJACK)
+
+    @property
+    def value(self) -> int:
+        """Blackjack value of the hand, equal to `hand_value(self)`."""
+        return self.hard + 10 * self.soft_aces
+
+    @property
+    def is_bust(self) -> bool:
+        """Whether the hand is over 21."""
+        return self.value > BLACKJACK
+
+    @property
+    def is_natural(self) -> bool:
+        """Whether the hand is a two card 21."""
+        return len(self) == 2 and self.value == BLACKJACK
+
+    def append(self, card: Card) -> None:
+        super().append(card)
+        self._add(card)
+
+    def extend(self, cards: Iterable[Card]) -> None:
+        for card in cards:
+            self.append(card)
+
+    def __iadd__(self, cards: Iterable[Card]) -> "Hand":  # type: ignore[override, misc]
+        self.extend(cards)
+        return self
+
+    def __imul__(self, count: SupportsIndex) -> "Hand":  # type: ignore[override, misc]
+        super().__imul__(count)
+        self._rebuild()
+        return self
+
+    def copy(self) -> "Hand":
+        """Copy of the hand with its totals."""
+        return Hand(self)
+
+    def clear(self) -> None:
+        super().clear()
+        self._rebuild()
+
+    def insert(self, index: SupportsIndex, card: Card) -> None:
+        super().insert(index, card)
+        self._rebuild()
+
+    def pop(self, index: SupportsIndex = -1) -> Card:
+        card = super().pop(index)
+        self._rebuild()
+        return card
+
+    def remove(self, card: Card) -> None:
+        super().remove(card)
+        self._rebuild()
+
+    def __setitem__(self, index: Any, value: Any) -> None:
+        super().__setitem__(index, value)
+        self._rebuild()
+
+    def __delitem__(self, index: Any) -> None:
+        super().__delitem__(index)
+        self._rebuild()
+
+    def sort(self, *args: Any, **kwargs: Any) -> None:
+        super().sort(*args, **kwargs)
+        self._rebuild()
+
+    def reverse(self) -> None:
+        super().reverse()
+        self._rebuild()
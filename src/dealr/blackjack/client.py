@@ -1,23 +1,39 @@
 """Game logic server for blackjack."""
 
+import logging
+import pickle
 import random
 
+import numpy as np
 import zmq
 
 from dealr.blackjack import cards
 from dealr.blackjack.game import Dealer
 from dealr.blackjack.player import Player
+from dealr.blackjack.shoe import Shoe
+from dealr.card_detector import wire
+from dealr.dispenser import settlement
 
+logger = logging.getLogger(__name__)
 
-def serve(num_players: int, **ports: dict[str, int]) -> None:
+
+def serve(
+    num_players: int,
+    seed: int | None = None,
+    allow_pickle: bool = False,
+    **ports: dict[str, int],
+) -> None:
     """Spawns a blackjack 0MQ server/client.
 
     Args:
         num_players: Number of players to listen for.
+        seed: Seed for the shoe and stub payouts, random if None.
+        allow_pickle: Accept pickled hands from an old card detector.
         port: TCP port to listen on.
     """
+    rng = random.Random(seed)
     players = [Player(bet=100) for _ in range(num_players)]
-    game = Dealer(players)
+    game = Dealer(players, Shoe(rng=np.random.default_rng(seed)))
     context = zmq.Context()
 
     if "card-detector" in ports:
@@ -29,14 +45,24 @@ def serve(num_players: int, **ports: dict[str, int]) -> None:
         dispenser_socket = context.socket(zmq.REQ)
         dispenser_socket.connect(f"tcp://localhost:{ports['dispenser']}")
 
+    table = wire.TableState()
+    round_id = 0
     while True:
-        player_hands: list[list[cards.Card]] = card_detector_socket.recv_pyobj()
-        for player_id, hand in enumerate(player_hands):
-            players[player_id].hand = hand
-
-            amount = random.randint(-5, 5) * 100
-            dispenser_socket.send_string(f"{player_id} {amount}")
-            reply = dispenser_socket.recv_string()
+        try:
+            message = wire.recv_hands(card_detector_socket, allow_pickle)
+            if not table.apply(message):
+                continue
+        except (ValueError, pickle.UnpicklingError) as error:
+            logger.warning("Skipping hands message: %s", error)
+            continue
+        payouts = []
+        # seats past the players (the dealer's region) are not paid out
+        for player, hand in zip(players, table.cards()):
+            player.hand = cards.Hand(hand)
+            payouts.append(rng.randint(-5, 5) * 100)
+            print(player.hand)
 
-            print(players[player_id].hand)
-            print(reply)
+        # one round trip settles every seat
+        dispenser_socket.send_string(settlement.encode_settlement(round_id, payouts))
+        print(dispenser_socket.recv_string())
+        round_id += 1
@@ -0,0 +1,96 @@
+"""Compact integer encoding of playing cards.
+
+Every card has a canonical id in 0-51 ordered by rank then suit, the same order
+as the AprilTag card ids, so hands and decks can live in NumPy uint8 arrays.
+Lookup tables convert ids to ranks, blackjack points, detector labels and back.
+"""
+
+import itertools
+from collections.abc import Iterable, Mapping
+
+import numpy as np
+import numpy.typing as npt
+
+from dealr.blackjack import cards
+
+NUM_CARDS = 52
+NO_CARD = 255  # sentinel for labels and tags that are not cards
+
+# id -> card objects and back
+CARDS = [cards.Card(*args) for args in itertools.product(cards.Rank, cards.Suit)]
+CARD_IDS = {card: i for i, card in enumerate(CARDS)}
+
+# id -> rank value (ace is 1, king is 13) and blackjack points (ace is 1)
+RANKS = np.array([card.rank.value for card in CARDS], dtype=np.uint8)
+POINTS = np.array([cards.POINTS[card.rank] for card in CARDS], dtype=np.uint8)
+
+_RANK_LABELS = {
+    cards.Rank.ACE: "A",
+    cards.Rank.JACK: "J",
+    cards.Rank.QUEEN: "Q",
+    cards.Rank.KING: "K",
+}
+
+# id -> detector label like '10C' and back
+LABELS = [
+    f"{_RANK_LABELS.get(card.rank, card.rank.value)}{card.suit.name}" for card in CARDS
+]
+LABEL_IDS = {label: i for i, label in enumerate(LABELS)}
+
+# AprilTag id -> card id, tags 0-51 are printed on the cards in id order
+TAG_IDS = np.arange(NUM_CARDS, dtype=np.uint8)
+
+
+def yolo_class_table(names: Mapping[int, str]) -> npt.NDArray[np.uint8]:
+    """Builds a YOLO class index -> card id table from a model's class names.
+
+    Args:
+        names: Class names keyed by index, as in `data-config.yaml`.
+
+    Returns:
+        npt.NDArray[np.uint8]: Card id of each class, `NO_CARD` if unknown.
+    """
+    table = np.full(max(names, default=-1) + 1, NO_CARD, dtype=np.uint8)
+    for index, label in names.items():
+        table[index] = LABEL_IDS.get(label, NO_CARD)
+    return table
+
+
+# YOLO class index -> card id for the classes in data-config.yaml, which are
+# the card labels in sorted order
+YOLO_CLASS_IDS = yolo_class_table(dict(enumerate(sorted(LABELS))))
+
+
+def card_id(card: cards.Card) -> int:
+    """Returns the canonical id of a card."""
+    return CARD_IDS[card]
+
+
+def to_ids(hand: Iterable[cards.Card]) -> npt.NDArray[np.uint8]:
+    """Encodes a list of cards as an array of ids."""
+    return np.fromiter((CARD_IDS[card] for card in hand), dtype=np.uint8)
+
+
+def to_cards(ids: Iterable[int]) -> list[cards.Card]:
+    """Decodes an array of ids back into cards."""
+    return [CARDS[i] for i in ids]
+
+
+def tags_to_ids(tag_ids: npt.ArrayLike) -> npt.NDArray[np.uint8]:
+    """Maps AprilTag ids to card ids, with `NO_CARD` for non-card tags."""
+    tags = np.asarray(tag_ids, dtype=np.int64)
+    valid = (tags >= 0) & (tags < len(TAG_IDS))
+    ids = np.full(tags.shape, NO_CARD, dtype=np.uint8)
+    ids[valid] = TAG_IDS[tags[valid]]
+    return ids
+
+
+def classes_to_ids(
+    classes: npt.ArrayLike, table: npt.NDArray[np.uint8] = YOLO_CLASS_IDS
+) -> npt.NDArray[np.uint8]:
+    """Maps YOLO class indices to card ids, with `NO_CARD` for unknown classes."""
+    indices = np.asarray(classes, dtype=np.int64)
+    valid = (indices >= 0) & (indices < len(table))
+    ids = np.full(indices.shape, NO_CARD, dtype=np.uint8)
+    ids[valid] = table[indices[valid]]
+    return ids
@@ -0,0 +1,246 @@
+"""Append-only binary log of dealer events with indexed replay.
+
+Every event is one fixed-width little-endian record. A side index file holds
+the record offset at which each round starts, so a round can be found by
+binary search and parsed straight out of a memory map without scanning the
+log.
+"""
+
+import argparse
+import mmap
+import struct
+import time
+from dataclasses import dataclass, field
+from enum import IntEnum, auto
+from pathlib import Path
+from types import TracebackType
+
+import numpy as np
+import numpy.typing as npt
+
+from dealr.blackjack import cards, encoding
+
+DEALER_SEAT = 255
+
+# timestamp ns, round id, amount, kind, seat, card id, reserved
+RECORD = struct.Struct("<QIiBBBB")
+RECORD_DTYPE = np.dtype(
+    [
+        ("timestamp", "<u8"),
+        ("round", "<u4"),
+        ("amount", "<i4"),
+        ("kind", "u1"),
+        ("seat", "u1"),
+        ("card", "u1"),
+        ("reserved", "u1"),
+    ]
+)
+
+# round id, record offset of the round's first event
+INDEX = struct.Struct("<IQ")
+INDEX_DTYPE = np.dtype([("round", "<u4"), ("offset", "<u8")])
+
+
+class EventKind(IntEnum):
+    """Kinds of logged dealer events."""
+
+    BET = auto()
+    DEAL = auto()
+    HIT = auto()
+    STAND = auto()
+    DEALER_DRAW = auto()
+    SETTLE = auto()
+
+
+def index_path(path: Path) -> Path:
+    """Path of the index that belongs to a log file."""
+    return path.with_suffix(path.suffix + ".idx")
+
+
+class EventLog:
+    """Buffered writer that appends dealer events to a log file."""
+
+    def __init__(self, path: Path, buffer_size: int = 1 << 16) -> None:
+        """Opens a log for appending, continuing its round numbering.
+
+        Args:
+            path: Log file, created if missing.
+            buffer_size: Write buffer size in bytes.
+        """
+        self.path = path
+        self._log = path.open("ab", buffering=buffer_size)
+        self._index = index_path(path).open("ab", buffering=buffer_size)
+        self.records = self._log.tell() // RECORD.size
+        last = self._index.tell() - INDEX.size
+        if last >= 0:
+            with index_path(path).open("rb") as index:
+                index.seek(last)
+                self.round_id = INDEX.unpack(index.read(INDEX.size))[0] + 1
+        else:
+            self.round_id = 0
+
+    def begin_round(self) -> int:
+        """Starts a new round and indexes its first event.
+
+        Returns:
+            int: Id of the new round.
+        """
+        round_id = self.round_id
+        self._index.write(INDEX.pack(round_id, self.records))
+        self.round_id += 1
+        return round_id
+
+    def write(
+        self,
+        round_id: int,
+        kind: EventKind,
+        seat: int,
+        card: cards.Card | None = None,
+        amount: int = 0,
+    ) -> None:
+        """Appends one event to the log."""
+        card_id = encoding.NO_CARD if card is None else encoding.card_id(card)
+        self._log.write(
+            RECORD.pack(time.time_ns(), round_id, amount, kind, seat, card_id, 0)
+        )
+        self.records += 1
+
+    def flush(self) -> None:
+        """Pushes buffered records to the operating system."""
+        self._log.flush()
+        self._index.flush()
+
+    def close(self) -> None:
+        """Flushes and closes the log."""
+        self._log.close()
+        self._index.close()
+
+    def __enter__(self) -> "EventLog":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+@dataclass
+class RoundState:
+    """Table state rebuilt from a round's events."""
+
+    round_id: int
+    hands: dict[int, cards.Hand] = field(default_factory=dict)
+    dealer_hand: cards.Hand = field(default_factory=cards.Hand)
+    bets: dict[int, int] = field(default_factory=dict)
+    results: dict[int, int] = field(default_factory=dict)
+    actions: list[tuple[int, EventKind]] = field(default_factory=list)
+
+    def apply(self, kind: int, seat: int, card: int, amount: int) -> None:
+        """Applies one event to the state."""
+        match kind:
+            case EventKind.BET:
+                self.bets[seat] = amount
+                self.hands[seat] = cards.Hand()
+            case EventKind.DEAL | EventKind.DEALER_DRAW:
+                hand = self.dealer_hand if seat == DEALER_SEAT else self.hands[seat]
+                hand.append(encoding.CARDS[card])
+            case EventKind.HIT:
+                self.hands[seat].append(encoding.CARDS[card])
+                self.actions.append((seat, EventKind.HIT))
+            case EventKind.STAND:
+                self.actions.append((seat, EventKind.STAND))
+            case EventKind.SETTLE:
+                self.results[seat] = amount
+
+
+class EventLogReader:
+    """Memory-mapped reader that finds rounds through the index."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.index = np.fromfile(index_path(path), dtype=INDEX_DTYPE)
+        self._file = path.open("rb")
+        size = path.stat().st_size
+        self._map = (
+            mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        )
+        self.records: npt.NDArray[np.void] = (
+            np.frombuffer(self._map, dtype=RECORD_DTYPE, count=size // RECORD.size)
+            if self._map is not None
+            else np.empty(0, dtype=RECORD_DTYPE)
+        )
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def round_events(self, round_id: int) -> npt.NDArray[np.void]:
+        """Zero-copy view of one round's records.
+
+        Raises:
+            KeyError: If the round is not in the index.
+        """
+        i = int(np.searchsorted(self.index["round"], round_id))
+        if i >= len(self.index) or self.index["round"][i] != round_id:
+            raise KeyError(f"Round {round_id} is not in {self.path}")
+        start = int(self.index["offset"][i])
+        end = (
+            int(self.index["offset"][i + 1])
+            if i + 1 < len(self.index)
+            else len(self.records)
+        )
+        return self.records[start:end]
+
+    def replay(self, round_id: int) -> RoundState:
+        """Rebuilds a round's hands, bets and results from its events."""
+        state = RoundState(round_id)
+        for record in self.round_events(round_id).tolist():
+            _, _, amount, kind, seat, card, _ = record
+            state.apply(kind, seat, card, amount)
+        return state
+
+    def close(self) -> None:
+        """Releases the memory map."""
+        # drop views into the map before closing it
+        self.records = np.empty(0, dtype=RECORD_DTYPE)
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> "EventLogReader":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+def main() -> None:
+    """Replay tool that prints the state of logged rounds."""
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("log", type=Path)
+    parser.add_argument("rounds", type=int, nargs="*")
+    args = parser.parse_args()
+
+    with EventLogReader(args.log) as reader:
+        print(f"{len(reader)} rounds, {len(reader.records)} events")
+        for round_id in args.rounds:
+            state = reader.replay(round_id)
+            print(f"Round {round_id}")
+            print(f"  Dealer: {', '.join(map(str, state.dealer_hand))}")
+            for seat, hand in state.hands.items():
+                print(
+                    f"  Seat {seat}: {', '.join(map(str, hand))} "
+                    f"bet {state.bets[seat]} -> {state.results.get(seat)}"
+                )
+
+
+if __name__ == "__main__":
+    main()
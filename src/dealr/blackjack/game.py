@@ -1,16 +1,20 @@
 """FSM for a blackjack dealer."""
 
-import itertools
 import queue
-import random
+from abc import ABC, ABCMeta, abstractmethod
+from collections import deque
+from collections.abc import Callable
+from typing import ClassVar
 
 from statemachine import State, StateMachine
+from statemachine.exceptions import TransitionNotAllowed
+from statemachine.factory import StateMachineMetaclass
 
 from dealr.blackjack import cards
+from dealr.blackjack.cards import BLACKJACK, DEALER_LIMIT
+from dealr.blackjack.event_log import DEALER_SEAT, EventKind, EventLog
 from dealr.blackjack.player import Player, PlayerAction
-
-DEALER_LIMIT = 17
-BLACKJACK = 21
+from dealr.blackjack.shoe import Shoe
 
 
 def dealer_hand_value(hand: list[cards.Card]) -> int:
@@ -22,6 +26,9 @@ def dealer_hand_value(hand: list[cards.Card]) -> int:
     Returns:
         int: Value of the hand.
     """
+    if isinstance(hand, cards.Hand):
+        return hand.dealer_value
+
     value = 0
     for card in hand:
         match card.rank:
@@ -34,52 +41,78 @@ def dealer_hand_value(hand: list[cards.Card]) -> int:
     return value
 
 
-class Dealer(StateMachine):
-    """State machine for a blackjack dealer."""
+_Callback = Callable[["DealerRules"], object]
 
-    idle = State(initial=True)
-    waiting_for_player = State()
-    resolving_dealer = State()
-    done = State(final=True)
 
-    start_game = idle.to(waiting_for_player)
-    player_hits = waiting_for_player.to.itself()
-    player_stands = waiting_for_player.to.itself()
-    dealer_natural = waiting_for_player.to(done)
-    all_players_natural = waiting_for_player.to(done)
-    resolve_dealer_hand = waiting_for_player.to(resolving_dealer)
-    settle_bets = resolving_dealer.to(done)
+class DealerRules(ABC):
+    """Blackjack rules shared by every dealer FSM backend.
+
+    Holds the table state and the transition callbacks. Backends provide
+    `send`, which must queue events sent from inside a callback until the
+    current transition finishes.
+    """
 
-    def __init__(self, players: list[Player]) -> None:
+    def __init__(
+        self,
+        players: list[Player],
+        shoe: Shoe | None = None,
+        event_log: EventLog | None = None,
+    ) -> None:
         self.players = players
-        self.deck = list(
-            cards.Card(*args) for args in itertools.product(cards.Rank, cards.Suit)
-        )
-        self.hand: list[cards.Card] = []
+        self.shoe = shoe if shoe is not None else Shoe()
+        self.hand = cards.Hand()
         self.player_queue: queue.SimpleQueue[Player] = queue.SimpleQueue()
         self.current_player: Player | None = None
-        super().__init__()
+        self.event_log = event_log
+        self.round_id = -1
+        self._seats = {id(p): seat for seat, p in enumerate(players)}
+
+    def _log(
+        self,
+        kind: EventKind,
+        seat: int,
+        card: cards.Card | None = None,
+        amount: int = 0,
+    ) -> None:
+        """Records an event if the dealer has an event log."""
+        if self.event_log is not None:
+            self.event_log.write(self.round_id, kind, seat, card, amount)
+
+    @property
+    @abstractmethod
+    def state_id(self) -> str:
+        """Id of the current state."""
+
+    @abstractmethod
+    def send(self, event: str) -> object:
+        """Triggers an event on the FSM."""
 
     def on_start_game(self) -> None:
-        """Deal the initial cards from the deck, dealers included."""
-        random.shuffle(self.deck)
+        """Deal the initial cards from the shoe, dealers included."""
+        self.shoe.start_round()
+        if self.event_log is not None:
+            self.round_id = self.event_log.begin_round()
+            for seat, player in enumerate(self.players):
+                self._log(EventKind.BET, seat, amount=player.bet)
         # TODO: add hardware shuffling
         for _ in range(2):
-            for player in self.players:
-                card = self.deck.pop()
+            for seat, player in enumerate(self.players):
+                card = self.shoe.draw_card()
                 player.hand.append(card)  # TODO: deal card
-            dealer_card = self.deck.pop()
+                self._log(EventKind.DEAL, seat, card)
+            dealer_card = self.shoe.draw_card()
             self.hand.append(dealer_card)
+            self._log(EventKind.DEAL, DEALER_SEAT, dealer_card)
 
         # check for dealer/player naturals
-        if cards.hand_value(self.hand) == BLACKJACK:
+        if self.hand.value == BLACKJACK:
             for p in self.players:
-                if cards.hand_value(p.hand) != BLACKJACK:
+                if p.hand.value != BLACKJACK:
                     p.bet = 0
             self.send("dealer_natural")
         else:
             for p in self.players:
-                if cards.hand_value(p.hand) == BLACKJACK:
+                if p.hand.value == BLACKJACK:
                     p.bet = p.bet + p.bet // 2  # TODO: deal out chips
                     p.active = False
             if all(not p.active for p in self.players):
@@ -100,10 +133,11 @@ class Dealer(StateMachine):
     def on_player_hits(self) -> None:
         """Give players a card."""
         if self.current_player is not None:
-            card = self.deck.pop()
+            card = self.shoe.draw_card()
             self.current_player.hand.append(card)
             self.current_player.last_action = PlayerAction.HIT
-            if cards.hand_value(self.current_player.hand) > BLACKJACK:
+            self._log(EventKind.HIT, self._seats[id(self.current_player)], card)
+            if self.current_player.hand.is_bust:
                 self.current_player.active = False
                 self.current_player.bet = 0  # TODO: collect chips
             else:
@@ -113,25 +147,196 @@ class Dealer(StateMachine):
         """Does nothing but updates the player indices and state."""
         if self.current_player is not None:
             self.current_player.last_action = PlayerAction.STAND
+            self._log(EventKind.STAND, self._seats[id(self.current_player)])
 
     def on_resolve_dealer_hand(self) -> None:
         """Draws to the dealer until 17."""
-        while dealer_hand_value(self.hand) < DEALER_LIMIT:
-            card = self.deck.pop()
+        while self.hand.dealer_value < DEALER_LIMIT:
+            card = self.shoe.draw_card()
             self.hand.append(card)
+            self._log(EventKind.DEALER_DRAW, DEALER_SEAT, card)
         self.send("settle_bets")
 
     def on_settle_bets(self) -> None:
         """Settles bets after game conclusion."""
-        dealer_value = dealer_hand_value(self.hand)
+        dealer_value = self.hand.dealer_value
         active_players = [p for p in self.players if p.active]
         if dealer_value > BLACKJACK:
             for p in active_players:
                 p.bet *= 2  # TODO: deal out chips
         else:
             for p in active_players:
-                player_value = cards.hand_value(p.hand)
+                player_value = p.hand.value
                 if player_value > dealer_value:
                     p.bet *= 2  # TODO: deal out chips
                 elif player_value < dealer_value:
                     p.bet = 0  # TODO: collect chips
+
+    def on_enter_done(self) -> None:
+        """Records every player's final bet."""
+        for seat, player in enumerate(self.players):
+            self._log(EventKind.SETTLE, seat, amount=player.bet)
+
+
+class _DealerMeta(StateMachineMetaclass, ABCMeta):
+    """Metaclass of a state machine that also implements `DealerRules`."""
+
+
+class Dealer(StateMachine, DealerRules, metaclass=_DealerMeta):
+    """State machine for a blackjack dealer."""
+
+    idle = State(initial=True)
+    waiting_for_player = State()
+    resolving_dealer = State()
+    done = State(final=True)
+
+    start_game = idle.to(waiting_for_player)
+    player_hits = waiting_for_player.to.itself()
+    player_stands = waiting_for_player.to.itself()
+    dealer_natural = waiting_for_player.to(done)
+    all_players_natural = waiting_for_player.to(done)
+    resolve_dealer_hand = waiting_for_player.to(resolving_dealer)
+    settle_bets = resolving_dealer.to(done)
+
+    def __init__(
+        self,
+        players: list[Player],
+        shoe: Shoe | None = None,
+        event_log: EventLog | None = None,
+    ) -> None:
+        DealerRules.__init__(self, players, shoe, event_log)
+        StateMachine.__init__(self)
+
+    @property
+    def state_id(self) -> str:
+        """Id of the current state."""
+        return self.current_state.id
+
+
+class TableDealer(DealerRules):
+    """Blackjack dealer driven by a precompiled transition table.
+
+    Runs the same states, transitions and callbacks as `Dealer`, but looks
+    transitions up in a state x event table compiled from the `Dealer`
+    definition and calls the callbacks directly. Use it to run the rules at
+    simulation speed; `Dealer` stays the reference for diagrams.
+    """
+
+    STATES: ClassVar[list[str]] = [state.id for state in Dealer.states]
+    EVENTS: ClassVar[list[str]] = list(
+        dict.fromkeys(
+            str(event)
+            for state in Dealer.states
+            for transition in state.transitions
+            for event in transition.events
+        )
+    )
+    _state_index: ClassVar[dict[str, int]] = {s: i for i, s in enumerate(STATES)}
+    _event_index: ClassVar[dict[str, int]] = {e: i for i, e in enumerate(EVENTS)}
+
+    # per state x event: target state index, callbacks run before and after
+    # the state changes, in python-statemachine's order
+    _table: ClassVar[list[list[tuple[int, list[_Callback], list[_Callback]] | None]]]
+
+    def __init__(
+        self,
+        players: list[Player],
+        shoe: Shoe | None = None,
+        event_log: EventLog | None = None,
+    ) -> None:
+        super().__init__(players, shoe, event_log)
+        cls = type(self)
+        if "_table" not in cls.__dict__:  # once per class, subclasses included
+            cls._table = _compile(cls)
+        self.state = self._state_index[Dealer.initial_state.id]
+        self._events: deque[int] = deque()
+        self._processing = False
+
+    @property
+    def state_id(self) -> str:
+        """Id of the current state."""
+        return self.STATES[self.state]
+
+    def send(self, event: str) -> None:
+        """Triggers an event, queueing it if a transition is already running.
+
+        Raises:
+            TransitionNotAllowed: If the current state has no such transition.
+        """
+        self._events.append(self._event_index[event])
+        if self._processing:
+            return
+        self._processing = True
+        try:
+            while self._events:
+                self._trigger(self._events.popleft())
+        except TransitionNotAllowed:
+            self._events.clear()
+            raise
+        finally:
+            self._processing = False
+
+    def _trigger(self, event: int) -> None:
+        entry = self._table[self.state][event]
+        if entry is None:
+            raise TransitionNotAllowed(
+                getattr(Dealer, self.EVENTS[event]),
+                Dealer.states_map[self.STATES[self.state]],
+            )
+        target, before, after = entry
+        for callback in before:
+            callback(self)
+        self.state = target
+        for callback in after:
+            callback(self)
+
+
+def _compile(
+    dealer: type[TableDealer],
+) -> list[list[tuple[int, list[_Callback], list[_Callback]] | None]]:
+    """Builds a table dealer's transition table, resolving callbacks by name."""
+    table: list[list[tuple[int, list[_Callback], list[_Callback]] | None]] = [
+        [None] * len(dealer.EVENTS) for _ in dealer.STATES
+    ]
+    for state in Dealer.states:
+        for transition in state.transitions:
+            source, target = transition.source.id, transition.target.id
+            external = not transition.internal
+            for event in map(str, transition.events):
+                before = [f"before_{event}"]
+                before += [f"on_exit_{source}"] if external else []
+                before += [f"on_{event}"]
+                after = [f"on_enter_{target}"] if external else []
+                after += [f"after_{event}"]
+                table[dealer._state_index[source]][dealer._event_index[event]] = (
+                    dealer._state_index[target],
+                    [getattr(dealer, name) for name in before if hasattr(dealer, name)],
+                    [getattr(dealer, name) for name in after if hasattr(dealer, name)],
+                )
+    return table
+
+
+BACKENDS: dict[str, type[DealerRules]] = {
+    "statemachine": Dealer,
+    "table": TableDealer,
+}
+
+
+def make_dealer(
+    players: list[Player],
+    shoe: Shoe | None = None,
+    backend: str = "statemachine",
+    event_log: EventLog | None = None,
+) -> DealerRules:
+    """Builds a dealer on the chosen FSM backend.
+
+    Args:
+        players: Players at the table.
+        shoe: Shoe to deal from, a fresh single deck if not given.
+        backend: Name of the backend in `BACKENDS`.
+        event_log: Log that records every deal, action and settlement.
+
+    Returns:
+        DealerRules: Dealer ready for `start_game`.
+    """
+    return BACKENDS[backend](players, shoe, event_log)
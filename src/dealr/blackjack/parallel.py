@@ -0,0 +1,141 @@
+"""Process pool runner for long blackjack simulations.
+
+Rounds are split into fixed-size chunks, and every chunk gets its own generator
+spawned from one seed, so results are identical for a given seed no matter how
+many workers run them or in which order they finish. Workers send back only
+their `SimulationStats`, which are merged by addition.
+"""
+
+import argparse
+import os
+import time
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+
+import numpy as np
+
+from dealr.blackjack.cards import DEALER_LIMIT
+from dealr.blackjack.simulation import SimulationStats, simulate
+
+
+@dataclass(frozen=True)
+class SimulationConfig:
+    """Table setup shared by every chunk."""
+
+    num_players: int = 1
+    bet: int = 100
+    stand_on: int = DEALER_LIMIT
+    num_decks: int = 1
+    batch_size: int = 100_000
+
+
+def _run_chunk(
+    config: SimulationConfig, rounds: int, seed: np.random.SeedSequence
+) -> SimulationStats:
+    return simulate(
+        rounds,
+        config.num_players,
+        config.bet,
+        config.stand_on,
+        config.num_decks,
+        config.batch_size,
+        rng=np.random.default_rng(seed),
+    )
+
+
+def iter_parallel(
+    rounds: int,
+    config: SimulationConfig | None = None,
+    seed: int | None = None,
+    workers: int | None = None,
+    chunk_rounds: int = 1_000_000,
+) -> Iterator[SimulationStats]:
+    """Simulates rounds across a process pool, yielding running totals.
+
+    Args:
+        rounds: Total number of rounds to play.
+        config: Table setup, defaults to `SimulationConfig()`.
+        seed: Root seed; chunk generators are spawned from it.
+        workers: Number of processes, all cores if None.
+        chunk_rounds: Rounds per chunk of work.
+
+    Yields:
+        SimulationStats: Totals of every chunk finished so far.
+    """
+    config = config if config is not None else SimulationConfig()
+    num_chunks = -(-rounds // chunk_rounds)
+    seeds = np.random.SeedSequence(seed).spawn(num_chunks)
+    sizes = [min(chunk_rounds, rounds - i * chunk_rounds) for i in range(num_chunks)]
+
+    stats = SimulationStats(bet=config.bet)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_run_chunk, config, size, chunk_seed)
+            for size, chunk_seed in zip(sizes, seeds)
+        ]
+        for future in as_completed(futures):
+            stats += future.result()
+            yield stats
+
+
+def run_parallel(
+    rounds: int,
+    config: SimulationConfig | None = None,
+    seed: int | None = None,
+    workers: int | None = None,
+    chunk_rounds: int = 1_000_000,
+) -> SimulationStats:
+    """Simulates rounds across a process pool and returns the merged totals.
+
+    Args:
+        rounds: Total number of rounds to play.
+        config: Table setup, defaults to `SimulationConfig()`.
+        seed: Root seed; chunk generators are spawned from it.
+        workers: Number of processes, all cores if None.
+        chunk_rounds: Rounds per chunk of work.
+
+    Returns:
+        SimulationStats: Totals over every simulated round.
+    """
+    stats = SimulationStats()
+    for stats in iter_parallel(rounds, config, seed, workers, chunk_rounds):
+        pass
+    return stats
+
+
+def main() -> None:
+    """Command line driver for parallel simulations with progress output."""
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=100_000_000)
+    parser.add_argument("--num-players", type=int, default=1)
+    parser.add_argument("--bet", type=int, default=100)
+    parser.add_argument("--stand-on", type=int, default=DEALER_LIMIT)
+    parser.add_argument("--num-decks", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-rounds", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    config = SimulationConfig(args.num_players, args.bet, args.stand_on, args.num_decks)
+    start = time.perf_counter()
+    stats = SimulationStats()
+    for stats in iter_parallel(
+        args.rounds, config, args.seed, args.workers, args.chunk_rounds
+    ):
+        elapsed = time.perf_counter() - start
+        print(
+            f"{stats.rounds}/{args.rounds} rounds "
+            f"({stats.rounds / elapsed:,.0f}/s), "
+            f"house edge {stats.house_edge:.4%}",
+            flush=True,
+        )
+    print(f"Payout variance per hand: {stats.payout_variance:.1f}")
+    print(f"Table payout variance per round: {stats.table_variance:.1f}")
+    print(f"Chips out per round: {stats.chips_out_per_round:.2f}")
+    print(f"Chips in per round: {stats.chips_in_per_round:.2f}")
+
+
+if __name__ == "__main__":
+    main()
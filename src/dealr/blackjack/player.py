@@ -3,7 +3,7 @@
 from dataclasses import dataclass, field
 from enum import StrEnum, auto
 
-from dealr.blackjack.cards import Card
+from dealr.blackjack.cards import Hand
 
 
 class PlayerAction(StrEnum):
@@ -19,5 +19,5 @@ class Player:
 
     bet: int
     last_action: PlayerAction | None = None
-    hand: list[Card] = field(default_factory=list)
+    hand: Hand = field(default_factory=Hand)
     active: bool = True
@@ -0,0 +1,356 @@
+"""Exact dealer outcome probabilities and player EVs for a shoe composition.
+
+Compositions are the undealt card counts per point value (ace, 2-9, ten-value),
+packed into one integer key so sub-results can be memoized in an LRU cache.
+Dealer totals follow `game.dealer_hand_value`, player totals `cards.hand_value`.
+"""
+
+import argparse
+import functools
+from collections.abc import Sequence
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+
+from dealr.blackjack import cards
+from dealr.blackjack.cards import BLACKJACK, DEALER_LIMIT
+from dealr.blackjack.shoe import Shoe
+
+NUM_POINTS = 10  # ace, two to nine, ten-value
+FIELD_BITS = 8  # per point count in a composition key
+FIELD_MASK = (1 << FIELD_BITS) - 1
+
+# final dealer totals, the last outcome is a bust
+OUTCOMES = tuple(range(DEALER_LIMIT, BLACKJACK + 1))
+BUST = len(OUTCOMES)
+NUM_OUTCOMES = BUST + 1
+
+MAX_ACES = 4  # ace counts kept in precomputed player tables
+MAX_HARD = BLACKJACK
+
+Distribution = tuple[float, ...]
+
+
+def composition_key(counts: Sequence[int]) -> int:
+    """Packs undealt counts per point value (ace first) into a key."""
+    if len(counts) != NUM_POINTS:
+        raise ValueError(f"Expected {NUM_POINTS} point counts, got {len(counts)}")
+    key = 0
+    for point, count in enumerate(counts):
+        if not 0 <= count <= FIELD_MASK:
+            raise ValueError(f"Count {count} does not fit in a composition key")
+        key |= count << (FIELD_BITS * point)
+    return key
+
+
+def composition_counts(key: int) -> list[int]:
+    """Unpacks a composition key into counts per point value (ace first)."""
+    return [(key >> (FIELD_BITS * point)) & FIELD_MASK for point in range(NUM_POINTS)]
+
+
+def full_composition(num_decks: int = 1) -> int:
+    """Composition key of a freshly shuffled shoe."""
+    return composition_key([4 * num_decks] * 9 + [16 * num_decks])
+
+
+def shoe_composition(shoe: Shoe) -> int:
+    """Composition key of the cards left in a shoe."""
+    counts = shoe.rank_counts
+    return composition_key([*(int(c) for c in counts[:9]), int(counts[9:].sum())])
+
+
+def remove_cards(composition: int, points: Sequence[int]) -> int:
+    """Removes seen cards, given as blackjack points, from a composition."""
+    for point in points:
+        if (composition >> (FIELD_BITS * (point - 1))) & FIELD_MASK == 0:
+            raise ValueError(f"No {point} left in the composition")
+        composition -= 1 << (FIELD_BITS * (point - 1))
+    return composition
+
+
+def dealer_add(value: int, point: int) -> int:
+    """Adds one card to a dealer total with `dealer_hand_value`'s ace rule."""
+    if point == 1:
+        return value + (11 if DEALER_LIMIT < value + 11 < BLACKJACK else 1)
+    return value + point
+
+
+def player_value(hard: int, aces: int) -> int:
+    """Player total from its hard total and ace count, as `cards.hand_value`."""
+    soft = aces > 0 and hard - aces + 11 <= BLACKJACK
+    return hard + 10 if soft else hard
+
+
+def _outcome(value: int) -> int:
+    return BUST if value > BLACKJACK else value - DEALER_LIMIT
+
+
+class ProbabilityEngine:
+    """Memoized recursive evaluation of dealer outcomes and player EVs.
+
+    EVs are in units of the bet and assume the dealer has already checked for
+    a natural, as `Dealer.on_start_game` does before any player acts.
+    """
+
+    def __init__(self, cache_size: int | None = 1 << 20) -> None:
+        """Sets up the caches.
+
+        Args:
+            cache_size: Entries kept per LRU cache, unbounded if None.
+        """
+        self.dealer_distribution = functools.lru_cache(cache_size)(
+            self._dealer_distribution
+        )
+        self.dealer_up_distribution = functools.lru_cache(cache_size)(
+            self._dealer_up_distribution
+        )
+        self.hit_ev = functools.lru_cache(cache_size)(self._hit_ev)
+
+    def cache_clear(self) -> None:
+        """Empties every cache."""
+        self.dealer_distribution.cache_clear()
+        self.dealer_up_distribution.cache_clear()
+        self.hit_ev.cache_clear()
+
+    def _dealer_distribution(self, value: int, composition: int) -> Distribution:
+        """Distribution of the dealer's final total from a running total.
+
+        Args:
+            value: Dealer total so far.
+            composition: Key of the undealt cards.
+
+        Returns:
+            Distribution: Probability of each entry of `OUTCOMES`, then of a bust.
+        """
+        if value >= DEALER_LIMIT:
+            dist = [0.0] * NUM_OUTCOMES
+            dist[_outcome(value)] = 1.0
+            return tuple(dist)
+
+        counts = composition_counts(composition)
+        total = sum(counts)
+        if total == 0:
+            raise ValueError("Composition ran out of cards")
+        dist = [0.0] * NUM_OUTCOMES
+        for point, count in enumerate(counts, start=1):
+            if count == 0:
+                continue
+            p = count / total
+            sub = self.dealer_distribution(
+                dealer_add(value, point),
+                composition - (1 << (FIELD_BITS * (point - 1))),
+            )
+            for i in range(NUM_OUTCOMES):
+                dist[i] += p * sub[i]
+        return tuple(dist)
+
+    def _dealer_up_distribution(self, up: int, composition: int) -> Distribution:
+        """Dealer outcome distribution given the up card and no dealer natural.
+
+        Args:
+            up: Blackjack points of the dealer's first card.
+            composition: Key of the undealt cards, up card already removed.
+
+        Returns:
+            Distribution: Probability of each entry of `OUTCOMES`, then of a bust.
+        """
+        counts = composition_counts(composition)
+        value = dealer_add(0, up)
+        dist = [0.0] * NUM_OUTCOMES
+        mass = 0.0
+        for point, count in enumerate(counts, start=1):
+            if count == 0 or {up, point} == {1, 10}:
+                continue
+            sub = self.dealer_distribution(
+                dealer_add(value, point),
+                composition - (1 << (FIELD_BITS * (point - 1))),
+            )
+            mass += count
+            for i in range(NUM_OUTCOMES):
+                dist[i] += count * sub[i]
+        return tuple(d / mass for d in dist)
+
+    def stand_ev(self, value: int, up: int, composition: int) -> float:
+        """EV of standing on a player total against the dealer's up card."""
+        if value > BLACKJACK:
+            return -1.0
+        dist = self.dealer_up_distribution(up, composition)
+        ev = dist[BUST]
+        for total, p in zip(OUTCOMES, dist):
+            if value > total:
+                ev += p
+            elif value < total:
+                ev -= p
+        return ev
+
+    def _hit_ev(self, hard: int, aces: int, up: int, composition: int) -> float:
+        """EV of hitting once and then playing on optimally.
+
+        Args:
+            hard: Player total with every ace counted as 1.
+            aces: Number of aces in the player's hand.
+            up: Blackjack points of the dealer's first card.
+            composition: Key of the undealt cards.
+
+        Returns:
+            float: Expected net payout in units of the bet.
+        """
+        counts = composition_counts(composition)
+        total = sum(counts)
+        ev = 0.0
+        for point, count in enumerate(counts, start=1):
+            if count == 0:
+                continue
+            p = count / total
+            ev += p * self.best_ev(
+                hard + point,
+                aces + (point == 1),
+                up,
+                composition - (1 << (FIELD_BITS * (point - 1))),
+            )
+        return ev
+
+    def best_ev(self, hard: int, aces: int, up: int, composition: int) -> float:
+        """EV of the better of standing and hitting."""
+        value = player_value(hard, aces)
+        if value > BLACKJACK:
+            return -1.0
+        stand = self.stand_ev(value, up, composition)
+        if value == BLACKJACK:
+            return stand
+        return max(stand, self.hit_ev(hard, aces, up, composition))
+
+    def should_hit(
+        self,
+        hand: Sequence[cards.Card],
+        up: cards.Card,
+        hole: cards.Card,
+        shoe: Shoe,
+    ) -> bool:
+        """Whether hitting beats standing for a hand against the live shoe.
+
+        Args:
+            hand: Player's cards.
+            up: Dealer's face up card.
+            hole: Dealer's face down card. It has left the shoe but the
+                player cannot see it, so it is counted as undealt.
+            shoe: Shoe the round is dealt from.
+
+        Returns:
+            bool: Whether hitting has the higher EV.
+        """
+        hard = sum(cards.POINTS[card.rank] for card in hand)
+        aces = sum(card.rank == cards.Rank.ACE for card in hand)
+        up_points = cards.POINTS[up.rank]
+        hole_points = cards.POINTS[hole.rank]
+        composition = shoe_composition(shoe) + (1 << (FIELD_BITS * (hole_points - 1)))
+        value = player_value(hard, aces)
+        return self.hit_ev(hard, aces, up_points, composition) > self.stand_ev(
+            value, up_points, composition
+        )
+
+
+@dataclass
+class StrategyTable:
+    """Precomputed dealer distributions and player EVs for a full shoe.
+
+    Every entry assumes the shoe is full except for the dealer's up card.
+    Tables are indexed by up card points - 1 and, for the player, by hard
+    total and ace count; impossible player states are NaN.
+    """
+
+    num_decks: int
+    dealer: npt.NDArray[np.float64]  # (up, outcome)
+    stand: npt.NDArray[np.float64]  # (up, player value)
+    hit: npt.NDArray[np.float64]  # (up, hard, aces)
+
+    @classmethod
+    def compute(
+        cls, num_decks: int, engine: ProbabilityEngine | None = None
+    ) -> "StrategyTable":
+        """Evaluates every table entry with a probability engine."""
+        engine = engine if engine is not None else ProbabilityEngine()
+        dealer = np.zeros((NUM_POINTS, NUM_OUTCOMES))
+        stand = np.zeros((NUM_POINTS, BLACKJACK + 1))
+        hit = np.full((NUM_POINTS, MAX_HARD + 1, MAX_ACES + 1), np.nan)
+        for up in range(1, NUM_POINTS + 1):
+            composition = remove_cards(full_composition(num_decks), [up])
+            dealer[up - 1] = engine.dealer_up_distribution(up, composition)
+            for value in range(BLACKJACK + 1):
+                stand[up - 1, value] = engine.stand_ev(value, up, composition)
+            for hard in range(2, MAX_HARD + 1):
+                for aces in range(min(hard, MAX_ACES) + 1):
+                    # the non-ace cards must be able to sum to the rest
+                    if hard - aces == 1 or aces > 4 * num_decks:
+                        continue
+                    if player_value(hard, aces) <= BLACKJACK:
+                        hit[up - 1, hard, aces] = engine.hit_ev(
+                            hard, aces, up, composition
+                        )
+        return cls(num_decks, dealer, stand, hit)
+
+    def save(self, path: Path) -> None:
+        """Writes the tables to an `.npz` file."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(
+            path,
+            num_decks=self.num_decks,
+            dealer=self.dealer,
+            stand=self.stand,
+            hit=self.hit,
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "StrategyTable":
+        """Reads tables written by `save`."""
+        with np.load(path) as data:
+            return cls(
+                int(data["num_decks"]), data["dealer"], data["stand"], data["hit"]
+            )
+
+    def stand_ev(self, value: int, up: int) -> float:
+        """Looked up EV of standing on a player total."""
+        return -1.0 if value > BLACKJACK else float(self.stand[up - 1, value])
+
+    def hit_ev(self, hard: int, aces: int, up: int) -> float:
+        """Looked up EV of hitting a hand, NaN if the state is not tabulated."""
+        if hard > MAX_HARD or aces > MAX_ACES:
+            return float("nan")
+        return float(self.hit[up - 1, hard, aces])
+
+    def should_hit(self, hand: Sequence[cards.Card], up: cards.Card) -> bool:
+        """Whether hitting beats standing according to the table."""
+        hard = sum(cards.POINTS[card.rank] for card in hand)
+        aces = sum(card.rank == cards.Rank.ACE for card in hand)
+        up_points = cards.POINTS[up.rank]
+        return self.hit_ev(hard, aces, up_points) > self.stand_ev(
+            player_value(hard, aces), up_points
+        )
+
+
+def table_path(directory: Path, num_decks: int) -> Path:
+    """File name of the precomputed tables for a shoe size."""
+    return directory / f"strategy_{num_decks}deck.npz"
+
+
+def main() -> None:
+    """Precomputes strategy tables to disk."""
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-decks", type=int, nargs="+", default=[1, 6])
+    parser.add_argument("--out", type=Path, default=Path("tables"))
+    args = parser.parse_args()
+
+    for num_decks in args.num_decks:
+        engine = ProbabilityEngine()
+        table = StrategyTable.compute(num_decks, engine)
+        path = table_path(args.out, num_decks)
+        table.save(path)
+        info = engine.dealer_distribution.cache_info()
+        print(f"Wrote {path} ({info.currsize} dealer states cached)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Multi-deck dealing shoe with a cut card."""
+
+import logging
+
+import numpy as np
+
+from dealr.blackjack import cards, encoding
+
+logger = logging.getLogger(__name__)
+
+NUM_RANKS = len(cards.Rank)
+
+
+class Shoe:
+    """Shuffled card ids of one or more decks dealt from a cursor.
+
+    The cards live in one preallocated array that is reshuffled in place, and
+    the number of undealt cards of every rank is kept up to date, so dealing
+    does not allocate no matter how many rounds are played.
+    """
+
+    def __init__(
+        self,
+        num_decks: int = 1,
+        penetration: float = 0.75,
+        rng: np.random.Generator | None = None,
+    ) -> None:
+        """Builds and shuffles the shoe.
+
+        Args:
+            num_decks: Number of 52 card decks in the shoe.
+            penetration: Fraction of the shoe dealt before the cut card.
+            rng: Random generator to shuffle with.
+        """
+        if num_decks < 1:
+            raise ValueError("A shoe needs at least one deck")
+        if not 0.0 <= penetration <= 1.0:
+            raise ValueError("Penetration must be between 0 and 1")
+        self.num_decks = num_decks
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.ids = np.tile(np.arange(encoding.NUM_CARDS, dtype=np.uint8), num_decks)
+        self.cut = int(penetration * len(self.ids))
+        self.cursor = 0
+        self.round_start = 0
+        # undealt cards per rank, indexed by rank value - 1
+        self.rank_counts = np.empty(NUM_RANKS, dtype=np.int32)
+        self.shuffle()
+
+    def __len__(self) -> int:
+        return len(self.ids) - self.cursor
+
+    @property
+    def penetration(self) -> float:
+        """Fraction of the shoe dealt since the last shuffle."""
+        return self.cursor / len(self.ids)
+
+    @property
+    def needs_shuffle(self) -> bool:
+        """Whether the cut card has come out."""
+        return self.cursor >= self.cut
+
+    def shuffle(self) -> None:
+        """Collects every card and shuffles the shoe in place."""
+        self.rng.shuffle(self.ids)
+        self.cursor = 0
+        self.round_start = 0
+        self.rank_counts.fill(4 * self.num_decks)
+
+    def start_round(self) -> None:
+        """Reshuffles if the cut card came out and marks the start of a round."""
+        if self.needs_shuffle:
+            self.shuffle()
+        self.round_start = self.cursor
+
+    def draw(self) -> int:
+        """Deals the next card id."""
+        if self.cursor >= len(self.ids):
+            self._reshuffle_discards()
+        card = int(self.ids[self.cursor])
+        self.cursor += 1
+        self.rank_counts[encoding.RANKS[card] - 1] -= 1
+        return card
+
+    def draw_card(self) -> cards.Card:
+        """Deals the next card as a card object."""
+        return encoding.CARDS[self.draw()]
+
+    def _reshuffle_discards(self) -> None:
+        """Shuffles earlier rounds' discards back in when a round empties the shoe."""
+        if self.round_start == 0:
+            raise IndexError("Round dealt every card in the shoe")
+        logger.warning("Shoe ran out mid-round, reshuffling discards")
+        in_play = len(self.ids) - self.round_start
+        # move the cards in play to the front and shuffle the rest
+        self.ids[:] = np.roll(self.ids, -self.round_start)
+        discards = self.ids[in_play:]
+        self.rng.shuffle(discards)
+        self.cursor = in_play
+        self.round_start = 0
+        self.rank_counts[:] = np.bincount(
+            encoding.RANKS[discards] - 1, minlength=NUM_RANKS
+        )
@@ -0,0 +1,361 @@
+"""Vectorized Monte Carlo simulation of blackjack rounds.
+
+Plays many independent rounds at once as NumPy arrays while following the same
+rules as the `Dealer` state machine, so house edge and payout statistics can be
+estimated over millions of rounds.
+"""
+
+import argparse
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+from statemachine.exceptions import TransitionNotAllowed
+
+from dealr.blackjack import encoding
+from dealr.blackjack.game import (
+    BACKENDS,
+    BLACKJACK,
+    DEALER_LIMIT,
+    DealerRules,
+    make_dealer,
+)
+from dealr.blackjack.player import Player
+from dealr.blackjack.shoe import Shoe
+
+# widened so running totals can be summed in place
+POINTS = encoding.POINTS.astype(np.int16)
+
+ACE_POINTS = 1
+SOFT_ACE_BONUS = 10
+
+
+@dataclass
+class SimulationStats:
+    """Running totals of simulated rounds, mergeable across batches.
+
+    All payouts are net chips won by players, so a losing hand contributes
+    `-bet` and a natural contributes `bet // 2`.
+    """
+
+    rounds: int = 0
+    hands: int = 0
+    bet: int = 0
+    payout_sum: int = 0
+    payout_sq_sum: int = 0
+    table_sq_sum: int = 0
+    chips_out: int = 0
+    chips_in: int = 0
+
+    def __add__(self, other: "SimulationStats") -> "SimulationStats":
+        if self.rounds and other.rounds and self.bet != other.bet:
+            raise ValueError("Cannot merge simulations with different bets")
+        return SimulationStats(
+            rounds=self.rounds + other.rounds,
+            hands=self.hands + other.hands,
+            bet=self.bet or other.bet,
+            payout_sum=self.payout_sum + other.payout_sum,
+            payout_sq_sum=self.payout_sq_sum + other.payout_sq_sum,
+            table_sq_sum=self.table_sq_sum + other.table_sq_sum,
+            chips_out=self.chips_out + other.chips_out,
+            chips_in=self.chips_in + other.chips_in,
+        )
+
+    @classmethod
+    def from_payouts(
+        cls, payouts: npt.NDArray[np.int64], bet: int
+    ) -> "SimulationStats":
+        """Summarizes a (rounds, players) array of net payouts."""
+        table = payouts.sum(axis=1)
+        return cls(
+            rounds=payouts.shape[0],
+            hands=payouts.size,
+            bet=bet,
+            payout_sum=int(payouts.sum()),
+            payout_sq_sum=int(np.square(payouts).sum()),
+            table_sq_sum=int(np.square(table).sum()),
+            chips_out=int(payouts[payouts > 0].sum()),
+            chips_in=int(-payouts[payouts < 0].sum()),
+        )
+
+    @property
+    def house_edge(self) -> float:
+        """Expected house win as a fraction of the initial bet."""
+        return -self.payout_sum / (self.hands * self.bet)
+
+    @property
+    def payout_variance(self) -> float:
+        """Variance of a single hand's net payout in chips squared."""
+        mean = self.payout_sum / self.hands
+        return self.payout_sq_sum / self.hands - mean * mean
+
+    @property
+    def table_variance(self) -> float:
+        """Variance of the whole table's net payout per round."""
+        mean = self.payout_sum / self.rounds
+        return self.table_sq_sum / self.rounds - mean * mean
+
+    @property
+    def chips_out_per_round(self) -> float:
+        """Average chips the house pays out to winners each round."""
+        return self.chips_out / self.rounds
+
+    @property
+    def chips_in_per_round(self) -> float:
+        """Average chips the house collects from losers each round."""
+        return self.chips_in / self.rounds
+
+
+def shuffled_decks(
+    rng: np.random.Generator, rounds: int, num_decks: int = 1
+) -> npt.NDArray[np.uint8]:
+    """Draws one independently shuffled shoe per round.
+
+    Args:
+        rng: Random generator to shuffle with.
+        rounds: Number of shoes to shuffle.
+        num_decks: Number of 52 card decks in each shoe.
+
+    Returns:
+        npt.NDArray[np.uint8]: (rounds, 52 * num_decks) card ids in dealing order.
+    """
+    decks = np.tile(np.arange(encoding.NUM_CARDS, dtype=np.uint8), (rounds, num_decks))
+    return rng.permuted(decks, axis=1)
+
+
+def _hand_value(
+    hard: npt.NDArray[np.integer], aces: npt.NDArray[np.integer]
+) -> npt.NDArray[np.integer]:
+    """Vectorized `cards.hand_value` from hard totals and ace counts."""
+    non_aces = hard - aces
+    soft = (aces > 0) & (non_aces + 11 <= BLACKJACK)
+    return np.where(soft, hard + SOFT_ACE_BONUS, hard)
+
+
+def _dealer_add(
+    value: npt.NDArray[np.integer], points: npt.NDArray[np.integer]
+) -> npt.NDArray[np.integer]:
+    """Vectorized single card step of `game.dealer_hand_value`."""
+    hard_eleven = (
+        (points == ACE_POINTS) & (DEALER_LIMIT < value + 11) & (value + 11 < BLACKJACK)
+    )
+    return value + np.where(hard_eleven, 11, points)
+
+
+def play_rounds(
+    decks: npt.NDArray[np.uint8],
+    num_players: int,
+    bet: int,
+    stand_on: int = DEALER_LIMIT,
+) -> npt.NDArray[np.int64]:
+    """Plays one round per deck with every player hitting below `stand_on`.
+
+    Cards are dealt from the front of each deck in the same order as
+    `Dealer.on_start_game`, and players act round-robin like the dealer's
+    player queue.
+
+    Args:
+        decks: (rounds, cards) card ids in dealing order.
+        num_players: Number of players at the table.
+        bet: Initial bet of every player.
+        stand_on: Lowest hand value a player stands on.
+
+    Returns:
+        npt.NDArray[np.int64]: (rounds, players) net chips won by each player.
+    """
+    rounds = decks.shape[0]
+    rows = np.arange(rounds)
+    points = POINTS[decks]
+
+    # initial deal: one card to each player then the dealer, twice
+    first = points[:, :num_players]
+    second = points[:, num_players + 1 : 2 * num_players + 1]
+    hard = first + second
+    aces = (first == ACE_POINTS).astype(np.int16) + (second == ACE_POINTS)
+    dealer_cards = points[:, [num_players, 2 * num_players + 1]]
+    cursor = np.full(rounds, 2 * num_players + 2)
+
+    dealer_hard = dealer_cards.sum(axis=1)
+    dealer_aces = (dealer_cards == ACE_POINTS).sum(axis=1)
+    dealer_natural = _hand_value(dealer_hard, dealer_aces) == BLACKJACK
+    player_natural = _hand_value(hard, aces) == BLACKJACK
+
+    # players act in queue order, re-queueing after every hit
+    active = ~player_natural & ~dealer_natural[:, None]
+    hitting = active.copy()
+    while hitting.any():
+        for p in range(num_players):
+            hits = hitting[:, p] & (_hand_value(hard[:, p], aces[:, p]) < stand_on)
+            hitting[:, p] = hits
+            card = points[rows[hits], cursor[hits]]
+            cursor[hits] += 1
+            hard[hits, p] += card
+            aces[hits, p] += card == ACE_POINTS
+            bust = hits & (_hand_value(hard[:, p], aces[:, p]) > BLACKJACK)
+            active[bust, p] = False
+            hitting[bust, p] = False
+
+    # dealer draws to the limit, counting aces in dealing order
+    dealer_value = _dealer_add(
+        _dealer_add(np.zeros_like(dealer_hard), dealer_cards[:, 0]), dealer_cards[:, 1]
+    )
+    drawing = ~dealer_natural & (dealer_value < DEALER_LIMIT)
+    while drawing.any():
+        card = points[rows[drawing], cursor[drawing]]
+        cursor[drawing] += 1
+        dealer_value[drawing] = _dealer_add(dealer_value[drawing], card)
+        drawing &= dealer_value < DEALER_LIMIT
+
+    # settle bets
+    player_value = _hand_value(hard, aces)
+    dealer_bust = (dealer_value > BLACKJACK)[:, None]
+    wins = active & (dealer_bust | (player_value > dealer_value[:, None]))
+    losses = active & ~dealer_bust & (player_value < dealer_value[:, None])
+
+    payouts = np.zeros((rounds, num_players), dtype=np.int64)
+    payouts[wins] = bet
+    payouts[losses | ~active] = -bet
+    payouts[player_natural & ~dealer_natural[:, None]] = bet // 2
+    payouts[player_natural & dealer_natural[:, None]] = 0
+    return payouts
+
+
+def simulate(
+    rounds: int,
+    num_players: int = 1,
+    bet: int = 100,
+    stand_on: int = DEALER_LIMIT,
+    num_decks: int = 1,
+    batch_size: int = 100_000,
+    rng: np.random.Generator | None = None,
+) -> SimulationStats:
+    """Simulates rounds in batches and accumulates their statistics.
+
+    Args:
+        rounds: Total number of rounds to play.
+        num_players: Number of players at the table.
+        bet: Initial bet of every player.
+        stand_on: Lowest hand value a player stands on.
+        num_decks: Number of decks freshly shuffled for every round.
+        batch_size: Number of rounds played at once.
+        rng: Random generator to shuffle with.
+
+    Returns:
+        SimulationStats: Totals over every simulated round.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    stats = SimulationStats(bet=bet)
+    while stats.rounds < rounds:
+        n = min(batch_size, rounds - stats.rounds)
+        decks = shuffled_decks(rng, n, num_decks)
+        payouts = play_rounds(decks, num_players, bet, stand_on)
+        stats += SimulationStats.from_payouts(payouts, bet)
+    return stats
+
+
+def play_fsm_round(dealer: DealerRules, stand_on: int = DEALER_LIMIT) -> None:
+    """Plays a dealer round to completion with every player hitting below `stand_on`.
+
+    Args:
+        dealer: Freshly constructed dealer to drive.
+        stand_on: Lowest hand value a player stands on.
+    """
+    try:
+        dealer.send("start_game")
+    except TransitionNotAllowed:
+        # all_players_natural already finished the game before the queued
+        # resolve_dealer_hand is processed, so the round is settled
+        return
+    while dealer.state_id == "waiting_for_player":
+        player = dealer.current_player
+        assert player is not None
+        if player.hand.value < stand_on:
+            dealer.send("player_hits")
+        else:
+            dealer.send("player_stands")
+
+
+def cross_check(
+    rounds: int,
+    num_players: int = 1,
+    bet: int = 100,
+    stand_on: int = DEALER_LIMIT,
+    num_decks: int = 1,
+    seed: int | None = None,
+    backend: str = "statemachine",
+) -> list[int]:
+    """Replays the same shuffled decks through the dealer FSM and the vectorized engine.
+
+    Args:
+        rounds: Number of rounds to compare.
+        num_players: Number of players at the table.
+        bet: Initial bet of every player.
+        stand_on: Lowest hand value a player stands on.
+        num_decks: Number of decks in the dealer's shoe.
+        seed: Seed of the dealer's shuffle.
+        backend: Dealer FSM backend to compare against.
+
+    Returns:
+        list[int]: Indices of rounds whose payouts disagree.
+    """
+    # a zero penetration shoe is reshuffled at the start of every round
+    shoe = Shoe(num_decks, penetration=0.0, rng=np.random.default_rng(seed))
+    decks = np.empty((rounds, len(shoe.ids)), dtype=np.uint8)
+    expected = np.empty((rounds, num_players), dtype=np.int64)
+    for r in range(rounds):
+        players = [Player(bet=bet) for _ in range(num_players)]
+        dealer = make_dealer(players, shoe, backend)
+        play_fsm_round(dealer, stand_on)
+        decks[r] = shoe.ids
+        expected[r] = [p.bet - bet for p in players]
+
+    payouts = play_rounds(decks, num_players, bet, stand_on)
+    return np.flatnonzero((payouts != expected).any(axis=1)).tolist()
+
+
+def main() -> None:
+    """Command line driver for the blackjack simulator."""
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=1_000_000)
+    parser.add_argument("--num-players", type=int, default=1)
+    parser.add_argument("--bet", type=int, default=100)
+    parser.add_argument("--stand-on", type=int, default=DEALER_LIMIT)
+    parser.add_argument("--num-decks", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--cross-check", type=int, default=0, metavar="ROUNDS")
+    parser.add_argument("--backend", choices=BACKENDS, default="statemachine")
+    args = parser.parse_args()
+
+    if args.cross_check:
+        mismatches = cross_check(
+            args.cross_check,
+            args.num_players,
+            args.bet,
+            args.stand_on,
+            args.num_decks,
+            args.seed,
+            args.backend,
+        )
+        print(f"Cross-check: {len(mismatches)}/{args.cross_check} rounds disagree")
+        if mismatches:
+            print(f"First mismatches: {mismatches[:10]}")
+
+    stats = simulate(
+        args.rounds,
+        args.num_players,
+        args.bet,
+        args.stand_on,
+        args.num_decks,
+        rng=np.random.default_rng(args.seed),
+    )
+    print(f"Rounds: {stats.rounds}")
+    print(f"House edge: {stats.house_edge:.4%}")
+    print(f"Payout variance per hand: {stats.payout_variance:.1f}")
+    print(f"Table payout variance per round: {stats.table_variance:.1f}")
+    print(f"Chips out per round: {stats.chips_out_per_round:.2f}")
+    print(f"Chips in per round: {stats.chips_in_per_round:.2f}")
+
+
+if __name__ == "__main__":
+    main()
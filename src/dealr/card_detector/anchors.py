@@ -0,0 +1,114 @@
+"""Cached corners of the table's anchor AprilTags.
+
+The tags marking the seat regions do not move during a session, so finding
+them again in every full resolution frame is wasted work. The cache finds
+them once, then only checks at a low rate that each one is still in a small
+window around its last known corners. The whole frame is searched again only
+when that check fails, or at the same low rate while some anchor has never
+been seen.
+"""
+
+import logging
+import time
+from collections.abc import Iterable
+
+import numpy as np
+import numpy.typing as npt
+import pupil_apriltags as apriltag
+
+logger = logging.getLogger(__name__)
+
+WINDOW = 1.0  # tag side lengths added around a tag's corners when re-checking
+
+
+class AnchorCache:
+    """Corners of fixed tags, found once and re-checked cheaply."""
+
+    def __init__(
+        self,
+        tag_ids: Iterable[int],
+        detector: apriltag.Detector,
+        recheck: float = 5.0,
+        window: float = WINDOW,
+    ) -> None:
+        """Sets up an empty cache.
+
+        Args:
+            tag_ids: Ids of the anchor tags.
+            detector: AprilTag detector.
+            recheck: Seconds between checks of the cached corners.
+            window: Tag side lengths added around a tag's last corners to
+                form the window it is looked for in.
+        """
+        self.tag_ids = frozenset(tag_ids)
+        self.detector = detector
+        self.recheck = recheck
+        self.window = window
+        self.corners: dict[int, npt.NDArray[np.float64]] = {}
+        self.last_check = -np.inf
+        self.full_detections = 0
+
+    @property
+    def calibrated(self) -> bool:
+        """Whether every anchor has been found."""
+        return len(self.corners) == len(self.tag_ids)
+
+    def locate(
+        self, gray: npt.NDArray[np.uint8], now: float | None = None
+    ) -> dict[int, npt.NDArray[np.float64]]:
+        """Corners of the anchors, searching only when due.
+
+        The whole frame is searched on every frame until some anchor is
+        found, then at most once per `recheck` for the missing ones.
+
+        Args:
+            gray: Grayscale frame.
+            now: Monotonic time of the frame, the current time if None.
+
+        Returns:
+            dict: Corners of every anchor found so far, by tag id.
+        """
+        now = time.monotonic() if now is None else now
+        if not self.corners:
+            self.calibrate(gray)
+            self.last_check = now
+        elif now - self.last_check >= self.recheck:
+            self.last_check = now
+            moved = not self.check(gray)
+            if moved:
+                logger.warning("Anchor tags moved, searching the whole frame")
+            if moved or not self.calibrated:
+                self.calibrate(gray)
+        return self.corners
+
+    def calibrate(self, gray: npt.NDArray[np.uint8]) -> None:
+        """Searches the whole frame for the anchors.
+
+        Anchors that are not found, say under a dealer's hand, keep their
+        cached corners.
+        """
+        self.full_detections += 1
+        for det in self.detector.detect(gray):
+            if det.tag_id in self.tag_ids:
+                self.corners[det.tag_id] = det.corners
+
+    def check(self, gray: npt.NDArray[np.uint8]) -> bool:
+        """Looks for every anchor in a window around its cached corners.
+
+        Returns:
+            bool: Whether every anchor was found; found ones are updated.
+        """
+        height, width = gray.shape[:2]
+        ok = True
+        for tag_id, corners in list(self.corners.items()):
+            low, high = corners.min(axis=0), corners.max(axis=0)
+            grow = (high - low).max() * self.window
+            x_min, y_min = np.maximum(np.floor(low - grow), 0).astype(int)
+            x_max, y_max = np.minimum(np.ceil(high + grow), [width, height]).astype(int)
+            crop = np.ascontiguousarray(gray[y_min:y_max, x_min:x_max])
+            found = [det for det in self.detector.detect(crop) if det.tag_id == tag_id]
+            if found:
+                self.corners[tag_id] = found[0].corners + [x_min, y_min]
+            else:
+                ok = False
+        return ok
@@ -1,15 +1,11 @@
-import itertools
-
 import cv2
 import pupil_apriltags as apriltag
 import numpy as np
 
-from dealr.blackjack import cards
+from dealr.blackjack import cards, encoding
 
 # Map AprilTag IDs to card names and values
-CARD_MAP = dict(
-    enumerate(cards.Card(*args) for args in itertools.product(cards.Rank, cards.Suit))
-)
+CARD_MAP = {int(tag): encoding.CARDS[card] for tag, card in enumerate(encoding.TAG_IDS)}
 
 
 def get_color_and_label(
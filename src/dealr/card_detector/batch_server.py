@@ -0,0 +1,401 @@
+"""Batched card model inference shared by every table's camera.
+
+Each table writes its camera frames into its own `FrameRing` and registers
+the ring with the server over a REQ/REP control socket. The server loads the
+model once, gathers the newest frame of every table that has one within a
+short time window, runs them as one batch and publishes each table's boxes
+on a PUB socket under the table id as topic. Tables can come and go while the
+server runs.
+"""
+
+import argparse
+import json
+import logging
+import struct
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+import tomli
+import zmq
+
+from dealr.card_detector import inference
+from dealr.card_detector.frame_ring import FrameRing, FrameRingSpec
+from dealr.card_detector.inference import Detections
+
+logger = logging.getLogger(__name__)
+
+PORTS_PATH = Path(__file__).parents[1] / "ports.toml"
+MAX_TABLE_ID = 0xFFFF  # table ids are sent as uint16
+
+# frame sequence, capture timestamp ns, batch size the frame ran in
+RESULT_HEADER = struct.Struct("<QQH")
+
+
+def topic(table_id: int) -> bytes:
+    """PUB topic of a table's results."""
+    return f"table-{table_id}".encode()
+
+
+def encode_result(
+    table_id: int, seq: int, timestamp_ns: int, batch_size: int, found: Detections
+) -> list[bytes | npt.NDArray[np.generic]]:
+    """Frames of one table's result message."""
+    return [
+        topic(table_id),
+        RESULT_HEADER.pack(seq, timestamp_ns, batch_size),
+        np.ascontiguousarray(found.boxes, dtype=np.float32),
+        np.ascontiguousarray(found.scores, dtype=np.float32),
+        np.ascontiguousarray(found.classes, dtype=np.int64),
+    ]
+
+
+def decode_result(
+    frames: list[bytes] | list[memoryview],
+) -> tuple[int, int, int, Detections]:
+    """Parses a result message.
+
+    Returns:
+        tuple: Frame sequence, capture timestamp, batch size and detections.
+    """
+    _, header, boxes, scores, classes = frames
+    seq, timestamp_ns, batch_size = RESULT_HEADER.unpack(header)
+    found = Detections(
+        np.frombuffer(boxes, dtype=np.float32).reshape(-1, 4),
+        np.frombuffer(scores, dtype=np.float32),
+        np.frombuffer(classes, dtype=np.int64),
+    )
+    return seq, timestamp_ns, batch_size, found
+
+
+@dataclass
+class BatchStats:
+    """Running batch fill and queueing delay figures."""
+
+    batches: int = 0
+    frames: int = 0
+    slots: int = 0  # registered tables summed over batches
+    stale: int = 0  # frames overwritten before their batch finished
+    delay_sum: float = 0.0
+    delay_max: float = 0.0
+
+    def add(self, batch_size: int, tables: int, delays: list[float]) -> None:
+        """Records one batch."""
+        self.batches += 1
+        self.frames += batch_size
+        self.slots += tables
+        self.delay_sum += sum(delays)
+        self.delay_max = max(self.delay_max, *delays)
+
+    @property
+    def fill(self) -> float:
+        """Mean share of registered tables with a frame in each batch."""
+        return self.frames / self.slots if self.slots else 0.0
+
+    @property
+    def mean_batch(self) -> float:
+        """Mean frames per batch."""
+        return self.frames / self.batches if self.batches else 0.0
+
+    @property
+    def mean_delay(self) -> float:
+        """Mean seconds from capture to the start of the frame's batch."""
+        return self.delay_sum / self.frames if self.frames else 0.0
+
+    def to_dict(self) -> dict[str, float]:
+        """Figures reported over the control socket."""
+        return {
+            "batches": self.batches,
+            "frames": self.frames,
+            "stale": self.stale,
+            "mean_batch": self.mean_batch,
+            "fill": self.fill,
+            "mean_delay": self.mean_delay,
+            "max_delay": self.delay_max,
+        }
+
+
+def _count(value: Any, name: str, minimum: int) -> int:
+    """Checks that a request field is an integer of at least `minimum`.
+
+    Raises:
+        TypeError: If the value is not an integer.
+        ValueError: If the value is too small.
+    """
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise TypeError(f"{name} must be an integer, not {value!r}")
+    if value < minimum:
+        raise ValueError(f"{name} must be at least {minimum}, not {value}")
+    return value
+
+
+class InferenceServer:
+    """Loads the card model once and runs every table's frames in batches."""
+
+    def __init__(
+        self,
+        control_port: int,
+        results_port: int,
+        backend: str = "onnx",
+        model_path: Path = inference.MODEL_PATH,
+        window: float = 0.005,
+        max_batch: int = 16,
+        stats_interval: float = 10.0,
+    ) -> None:
+        """Sets up the server.
+
+        Args:
+            control_port: REP port tables register on.
+            results_port: PUB port results are sent on.
+            backend: Inference backend in `inference.BACKENDS`.
+            model_path: Card model weights.
+            window: Longest wait in seconds for more tables' frames once the
+                first frame of a batch is ready.
+            max_batch: Most frames run in one forward pass.
+            stats_interval: Seconds between stats log lines, 0 to disable.
+        """
+        self.control_port = control_port
+        self.results_port = results_port
+        self.model = inference.make_backend(backend, model_path)
+        self.window = window
+        self.max_batch = max_batch
+        self.stats_interval = stats_interval
+        self.rings: dict[int, FrameRing] = {}
+        self.last_seq: dict[int, int] = {}
+        self.stats = BatchStats()
+        self.running = False
+
+    def register(self, table_id: int, spec: FrameRingSpec) -> None:
+        """Starts serving a table's frame ring."""
+        self.unregister(table_id)
+        self.rings[table_id] = FrameRing.attach(spec)
+        self.last_seq[table_id] = -1
+        logger.info("Registered table %d", table_id)
+
+    def unregister(self, table_id: int) -> None:
+        """Stops serving a table."""
+        ring = self.rings.pop(table_id, None)
+        self.last_seq.pop(table_id, None)
+        if ring is not None:
+            ring.close()
+            logger.info("Unregistered table %d", table_id)
+
+    def _handle(self, message: bytes) -> dict[str, Any]:
+        """Answers a control request, with an error reply if it is malformed."""
+        try:
+            request = json.loads(message)
+        except ValueError as e:
+            return {"ok": False, "error": f"Malformed request {message!r}: {e}"}
+        try:
+            match request.get("command") if isinstance(request, dict) else None:
+                case "register":
+                    table_id = _count(request["table_id"], "table_id", 0)
+                    if table_id > MAX_TABLE_ID:
+                        raise ValueError(f"table_id {table_id} is not a uint16")
+                    shape = tuple(_count(n, "shape", 1) for n in request["shape"])
+                    if not shape:
+                        raise ValueError("shape is empty")
+                    slots = _count(request["slots"], "slots", 1)
+                    spec = FrameRingSpec(str(request["ring"]), shape, slots)
+                    try:
+                        self.register(table_id, spec)
+                    except OSError as e:
+                        return {
+                            "ok": False,
+                            "error": f"Cannot open frame ring {spec.name}: {e}",
+                        }
+                    return {"ok": True}
+                case "unregister":
+                    self.unregister(_count(request["table_id"], "table_id", 0))
+                    return {"ok": True}
+                case "stats":
+                    return {
+                        "ok": True,
+                        "tables": len(self.rings),
+                        **self.stats.to_dict(),
+                    }
+        except (KeyError, ValueError, TypeError) as e:
+            return {"ok": False, "error": f"Malformed request {request!r}: {e!r}"}
+        return {"ok": False, "error": f"Unknown request {request!r}"}
+
+    def _ready(self) -> list[tuple[int, int]]:
+        """Tables with a frame newer than their last result, oldest first."""
+        ready = []
+        for table_id, ring in self.rings.items():
+            seq = ring.latest
+            if seq > self.last_seq[table_id]:
+                ready.append((ring.timestamp_ns(seq), table_id, seq))
+        ready.sort()
+        return [(table_id, seq) for _, table_id, seq in ready]
+
+    def _gather(self, control: zmq.Socket) -> list[tuple[int, int]]:
+        """Waits for a first frame, then up to `window` for other tables."""
+        while self.running:
+            if control.poll(0):
+                control.send_json(self._handle(control.recv()))
+            if ready := self._ready():
+                break
+            time.sleep(0.001)
+        else:
+            return []
+        deadline = time.monotonic() + self.window
+        while len(ready) < min(len(self.rings), self.max_batch):
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(0.0005)
+            ready = self._ready()
+        return ready[: self.max_batch]
+
+    def run_batch(self, ready: list[tuple[int, int]], results: zmq.Socket) -> None:
+        """Runs one batch and publishes each table's result."""
+        start_ns = time.time_ns()
+        rings = [self.rings[table_id] for table_id, _ in ready]
+        images = [ring.slot(seq) for ring, (_, seq) in zip(rings, ready)]
+        timestamps = [ring.timestamp_ns(seq) for ring, (_, seq) in zip(rings, ready)]
+        found = self.model.predict_batch(images)
+
+        delays = [(start_ns - t) / 1e9 for t in timestamps]
+        self.stats.add(len(ready), len(self.rings), delays)
+        for ring, (table_id, seq), timestamp_ns, detections in zip(
+            rings, ready, timestamps, found
+        ):
+            self.last_seq[table_id] = seq
+            if not ring.valid(seq):  # overwritten while it was being read
+                self.stats.stale += 1
+                continue
+            results.send_multipart(
+                encode_result(table_id, seq, timestamp_ns, len(ready), detections),
+                copy=False,
+            )
+
+    def serve(self) -> None:
+        """Serves tables until `stop` is called."""
+        context = zmq.Context()
+        control = context.socket(zmq.REP)
+        control.bind(f"tcp://*:{self.control_port}")
+        results = context.socket(zmq.PUB)
+        results.bind(f"tcp://*:{self.results_port}")
+
+        self.running = True
+        last_log = time.monotonic()
+        try:
+            while self.running:
+                if ready := self._gather(control):
+                    self.run_batch(ready, results)
+                now = time.monotonic()
+                if self.stats_interval and now - last_log >= self.stats_interval:
+                    last_log = now
+                    logger.info("Inference stats: %s", self.stats.to_dict())
+        finally:
+            for table_id in list(self.rings):
+                self.unregister(table_id)
+            control.close()
+            results.close()
+
+    def stop(self) -> None:
+        """Makes `serve` return after the current batch."""
+        self.running = False
+
+
+class InferenceClient:
+    """One table's connection to an `InferenceServer`."""
+
+    def __init__(
+        self,
+        table_id: int,
+        shape: tuple[int, ...],
+        control_port: int,
+        results_port: int,
+        host: str = "localhost",
+        slots: int = 4,
+    ) -> None:
+        """Creates the table's frame ring and registers it.
+
+        Args:
+            table_id: Id of the table.
+            shape: Shape of the camera's frames.
+            control_port: Server's REP port.
+            results_port: Server's PUB port.
+            host: Server's host, which must share memory with this one.
+            slots: Frames kept in the ring.
+        """
+        self.table_id = table_id
+        self.ring = FrameRing.create(shape, slots)
+        context = zmq.Context()
+        self.control = context.socket(zmq.REQ)
+        self.control.connect(f"tcp://{host}:{control_port}")
+        self.results = context.socket(zmq.SUB)
+        self.results.connect(f"tcp://{host}:{results_port}")
+        self.results.setsockopt(zmq.SUBSCRIBE, topic(table_id))
+        self._request(
+            command="register",
+            table_id=table_id,
+            ring=self.ring.spec.name,
+            shape=list(shape),
+            slots=slots,
+        )
+
+    def _request(self, **request: object) -> dict[str, Any]:
+        self.control.send_json(request)
+        reply: dict[str, Any] = self.control.recv_json()  # type: ignore[assignment]
+        if not reply.get("ok"):
+            raise RuntimeError(reply.get("error", "Inference server refused"))
+        return reply
+
+    def submit(self, seq: int, image: npt.ArrayLike, timestamp_ns: int = 0) -> None:
+        """Hands a camera frame to the server."""
+        self.ring.write(seq, timestamp_ns or time.time_ns(), image)
+
+    def receive(self, timeout: float | None = None) -> tuple[int, Detections] | None:
+        """Next result for this table.
+
+        Returns:
+            tuple | None: Frame sequence and detections, None on timeout.
+        """
+        if timeout is not None and not self.results.poll(int(timeout * 1000)):
+            return None
+        frames = self.results.recv_multipart(copy=False)
+        seq, _, _, found = decode_result([frame.buffer for frame in frames])
+        return seq, found
+
+    def stats(self) -> dict[str, Any]:
+        """Server's batch fill and queueing delay figures."""
+        return self._request(command="stats")
+
+    def close(self) -> None:
+        """Unregisters the table and frees its ring."""
+        self._request(command="unregister", table_id=self.table_id)
+        self.control.close()
+        self.results.close()
+        self.ring.close()
+
+
+def main() -> None:
+    """Command line driver for the inference server."""
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=inference.BACKENDS, default="onnx")
+    parser.add_argument("--model", type=Path, default=inference.MODEL_PATH)
+    parser.add_argument("--window", type=float, default=0.005)
+    parser.add_argument("--max-batch", type=int, default=16)
+    parser.add_argument("--stats-interval", type=float, default=10.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    ports = tomli.loads(PORTS_PATH.read_text(encoding="utf-8"))
+    InferenceServer(
+        ports["inference"],
+        ports["inference-results"],
+        args.backend,
+        args.model,
+        args.window,
+        args.max_batch,
+        args.stats_interval,
+    ).serve()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Headless throughput benchmark of the card detection pipeline.
+
+Frames from a video file or an image directory, by default the test split of
+the card dataset, are pushed through AprilTag detection, card detection and
+seat assignment one after another as fast as possible. No camera, display or
+socket is needed, so the numbers can be tracked on a build machine.
+"""
+
+import argparse
+import itertools
+import logging
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+
+from dealr.card_detector import inference
+from dealr.card_detector.inference import MODEL_PATH
+from dealr.card_detector.layout import TableLayout
+from dealr.card_detector.pipeline import DetectorService
+from dealr.card_detector.sources import TEST_IMAGES, FrameSource, open_source
+
+PERCENTILES = (50, 95, 99)
+
+
+@dataclass
+class BenchmarkResult:
+    """Timings of one benchmark run."""
+
+    seconds: float  # wall time of the measured frames
+    latencies: npt.NDArray[np.float64]  # seconds per measured frame
+
+    @property
+    def frames(self) -> int:
+        """Number of measured frames."""
+        return len(self.latencies)
+
+    @property
+    def fps(self) -> float:
+        """Measured frames per second."""
+        return self.frames / self.seconds if self.seconds else 0.0
+
+    def percentiles(self) -> dict[int, float]:
+        """Frame latency in ms at every percentile in `PERCENTILES`."""
+        if not self.frames:
+            return {q: float("nan") for q in PERCENTILES}
+        values = np.percentile(self.latencies, PERCENTILES) * 1000
+        return dict(zip(PERCENTILES, values.tolist()))
+
+    def summary(self) -> str:
+        """One line report."""
+        latency = "  ".join(f"p{q} {ms:.1f} ms" for q, ms in self.percentiles().items())
+        return f"{self.frames} frames  {self.fps:.1f} fps  {latency}"
+
+
+def run(
+    service: DetectorService,
+    source: FrameSource,
+    frames: int | None = None,
+    warmup: int = 5,
+) -> BenchmarkResult:
+    """Runs frames through the service's stages back to back.
+
+    Args:
+        service: Detector service whose stages are measured.
+        source: Frames to run, looped if `frames` asks for more than it has.
+        frames: Frames measured, None for the rest of the source.
+        warmup: Frames run first and not measured.
+
+    Returns:
+        BenchmarkResult: Wall time and per-frame latencies.
+    """
+    images = iter(source)
+    for seq, image in enumerate(itertools.islice(images, warmup)):
+        service.process(seq, image)
+    service.timings.reset()
+
+    latencies = []
+    start = time.perf_counter()
+    for seq, image in enumerate(itertools.islice(images, frames), start=warmup):
+        frame_start = time.perf_counter()
+        service.process(seq, image)
+        latencies.append(time.perf_counter() - frame_start)
+    seconds = time.perf_counter() - start
+    return BenchmarkResult(seconds, np.array(latencies))
+
+
+def main() -> None:
+    """Command line driver for the pipeline benchmark."""
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--source",
+        default=str(TEST_IMAGES),
+        help="video file or image directory, or a camera index",
+    )
+    parser.add_argument("--frames", type=int, default=None)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--model", type=Path, default=MODEL_PATH)
+    parser.add_argument(
+        "--tags", action="store_true", help="read cards from AprilTags, not YOLO"
+    )
+    parser.add_argument("--backend", choices=inference.BACKENDS, default="ultralytics")
+    parser.add_argument(
+        "--roi", action="store_true", help="detect cards in seat regions only"
+    )
+    parser.add_argument("--image-size", type=int, default=inference.IMAGE_SIZE)
+    parser.add_argument("--layout", type=Path, help="seat layout TOML file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    service = DetectorService(
+        0,
+        args.source,
+        layout=TableLayout.load(args.layout) if args.layout else None,
+        model_path=None if args.tags else args.model,
+        backend=args.backend,
+        roi=args.roi,
+        image_size=args.image_size,
+    )
+    loop = args.frames is not None
+    with open_source(args.source, loop=loop, preload=True) as source:
+        result = run(service, source, args.frames, args.warmup)
+    print(result.summary())
+    print(f"stage ms p50/p95/p99: {service.timings.log_line()}")
+
+
+if __name__ == "__main__":
+    main()
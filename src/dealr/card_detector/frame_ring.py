@@ -0,0 +1,184 @@
+"""Shared memory ring buffer of camera frames.
+
+One capture process writes frames into preallocated slots, and any number of
+worker processes read them in place, so no frame is pickled or piped. Every
+slot carries the sequence number of the frame in it. The writer marks a slot
+as busy while it copies a frame in, and readers check the slot's sequence
+number again after using a frame to know it was not overwritten meanwhile.
+"""
+
+import time
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from types import TracebackType
+
+import numpy as np
+import numpy.typing as npt
+
+EMPTY = -1  # slot sequence number while no frame is in it
+WRITING = -2  # slot sequence number while the writer fills it
+
+# slot header fields, int64 each
+SEQ, TIMESTAMP = range(2)
+HEADER_FIELDS = 2
+
+
+@dataclass(frozen=True)
+class FrameRingSpec:
+    """Everything a process needs to attach to a ring, safe to pickle."""
+
+    name: str
+    shape: tuple[int, ...]
+    slots: int
+
+    @property
+    def frame_bytes(self) -> int:
+        """Size of one frame slot."""
+        return int(np.prod(self.shape))
+
+    @property
+    def size(self) -> int:
+        """Size of the shared memory block."""
+        header = (1 + self.slots * HEADER_FIELDS) * np.dtype(np.int64).itemsize
+        return header + self.slots * self.frame_bytes
+
+
+class FrameRing:
+    """Fixed slots of `uint8` frames in a shared memory block."""
+
+    def __init__(self, spec: FrameRingSpec, memory: shared_memory.SharedMemory):
+        self.spec = spec
+        self.memory = memory
+        header_len = 1 + spec.slots * HEADER_FIELDS
+        header: npt.NDArray[np.int64] = np.ndarray(
+            header_len, dtype=np.int64, buffer=memory.buf
+        )
+        self._latest = header[:1]  # sequence number of the newest frame
+        self._slots = header[1:].reshape(spec.slots, HEADER_FIELDS)
+        self.frames: npt.NDArray[np.uint8] = np.ndarray(
+            (spec.slots, *spec.shape),
+            dtype=np.uint8,
+            buffer=memory.buf,
+            offset=header.nbytes,
+        )
+        self.owner = False
+
+    @classmethod
+    def create(cls, shape: tuple[int, ...], slots: int = 4) -> "FrameRing":
+        """Allocates a new ring, owned by the calling process.
+
+        Args:
+            shape: Shape of every frame, like `(1080, 1920, 3)`.
+            slots: Number of frames kept; readers have this many frames of
+                time to use one before it is overwritten.
+
+        Returns:
+            FrameRing: Empty ring.
+        """
+        size = FrameRingSpec("", shape, slots).size
+        memory = shared_memory.SharedMemory(create=True, size=size)
+        ring = cls(FrameRingSpec(memory.name, tuple(shape), slots), memory)
+        ring._latest[0] = EMPTY
+        ring._slots[:, SEQ] = EMPTY
+        ring.owner = True
+        return ring
+
+    @classmethod
+    def attach(cls, spec: FrameRingSpec) -> "FrameRing":
+        """Opens a ring created by another process.
+
+        Raises:
+            FileNotFoundError: If there is no ring of that name.
+            ValueError: If the ring is smaller than the spec describes.
+        """
+        memory = shared_memory.SharedMemory(spec.name, track=False)
+        if memory.size < spec.size:
+            memory.close()
+            raise ValueError(f"Frame ring {spec.name} is smaller than its spec")
+        return cls(spec, memory)
+
+    @property
+    def latest(self) -> int:
+        """Sequence number of the newest complete frame, `EMPTY` if none."""
+        return int(self._latest[0])
+
+    def write(self, seq: int, timestamp_ns: int, frame: npt.ArrayLike) -> None:
+        """Copies a frame into its slot. Only one process may write.
+
+        Args:
+            seq: Frame sequence number, increasing from 0.
+            timestamp_ns: Capture time of the frame in ns.
+            frame: Image of the ring's frame shape.
+        """
+        slot = seq % self.spec.slots
+        self._slots[slot, SEQ] = WRITING
+        self.frames[slot] = frame
+        self._slots[slot, TIMESTAMP] = timestamp_ns
+        self._slots[slot, SEQ] = seq
+        self._latest[0] = seq
+
+    def slot(self, seq: int) -> npt.NDArray[np.uint8]:
+        """View of the slot that holds, or held, a frame."""
+        return self.frames[seq % self.spec.slots]
+
+    def timestamp_ns(self, seq: int) -> int:
+        """Capture time of a frame still in the ring."""
+        return int(self._slots[seq % self.spec.slots, TIMESTAMP])
+
+    def valid(self, seq: int) -> bool:
+        """Whether a frame is still in its slot, unchanged."""
+        return int(self._slots[seq % self.spec.slots, SEQ]) == seq
+
+    def read_latest(
+        self, after: int = EMPTY
+    ) -> tuple[int, npt.NDArray[np.uint8]] | None:
+        """Newest frame, read in place.
+
+        Call `valid` with the returned sequence number after using the frame
+        to make sure the writer did not lap the reader.
+
+        Args:
+            after: Sequence number of the last frame the reader handled.
+
+        Returns:
+            tuple | None: Sequence number and view of the newest frame, None if
+            there is no frame newer than `after`.
+        """
+        seq = self.latest
+        if seq <= after or not self.valid(seq):
+            return None
+        return seq, self.slot(seq)
+
+    def wait_latest(
+        self, after: int = EMPTY, timeout: float | None = None, poll: float = 0.001
+    ) -> tuple[int, npt.NDArray[np.uint8]] | None:
+        """Polls for a frame newer than `after`.
+
+        Returns:
+            tuple | None: As `read_latest`, None on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while (frame := self.read_latest(after)) is None:
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(poll)
+        return frame
+
+    def close(self) -> None:
+        """Detaches from the ring, and frees it if this process created it."""
+        # drop the views so the buffer can be released
+        del self._latest, self._slots, self.frames
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+    def __enter__(self) -> "FrameRing":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
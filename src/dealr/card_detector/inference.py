@@ -0,0 +1,454 @@
+"""Card model inference backends.
+
+The `ultralytics` backend runs the trained weights through `YOLO.predict`. The
+`onnx` backend exports the weights once to a slimmed ONNX graph, cached by the
+hash of the weights, and runs it with ONNX Runtime on the CPU using NumPy
+letterboxing and non-maximum suppression, which avoids loading torch at all
+once the export is cached.
+"""
+
+import ast
+import hashlib
+import logging
+import shutil
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Protocol
+
+import cv2
+import numpy as np
+import numpy.typing as npt
+
+from dealr.blackjack import encoding
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = Path(__file__).parent / "models" / "best.pt"
+CACHE_DIR = Path.home() / ".cache" / "dealr"
+IMAGE_SIZE = 640
+CONFIDENCE = 0.5
+IOU = 0.7  # NMS overlap threshold, as ultralytics
+MAX_DETECTIONS = 300
+PAD_VALUE = 114  # letterbox border grey, as ultralytics
+
+
+@dataclass
+class Detections:
+    """Boxes found in one image, in the image's pixel coordinates."""
+
+    boxes: npt.NDArray[np.float32]  # (n, 4) x min, y min, x max, y max
+    scores: npt.NDArray[np.float32]
+    classes: npt.NDArray[np.int64]
+
+    @classmethod
+    def empty(cls) -> "Detections":
+        """No detections."""
+        return cls(
+            np.empty((0, 4), dtype=np.float32),
+            np.empty(0, dtype=np.float32),
+            np.empty(0, dtype=np.int64),
+        )
+
+    @property
+    def centers(self) -> npt.NDArray[np.float32]:
+        """`(n, 2)` box centers."""
+        return ((self.boxes[:, :2] + self.boxes[:, 2:]) / 2).astype(np.float32)
+
+
+class Backend(Protocol):
+    """Runs the card model on BGR images."""
+
+    names: Mapping[int, str]
+
+    def predict(self, image: npt.NDArray[np.uint8]) -> Detections: ...
+
+    def predict_batch(
+        self, images: Sequence[npt.NDArray[np.uint8]]
+    ) -> list[Detections]: ...
+
+
+def letterbox(
+    image: npt.NDArray[np.uint8], size: int = IMAGE_SIZE
+) -> tuple[npt.NDArray[np.float32], float, tuple[float, float]]:
+    """Scales an image into a padded square model input.
+
+    Args:
+        image: BGR image.
+        size: Side of the square model input.
+
+    Returns:
+        tuple: `(3, size, size)` RGB input in [0, 1], the scale applied to the
+        image and the x and y padding added before it.
+    """
+    height, width = image.shape[:2]
+    scale = min(size / height, size / width)
+    new_width, new_height = round(width * scale), round(height * scale)
+    if (new_width, new_height) != (width, height):
+        image = np.asarray(
+            cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+        )
+    pad_x = (size - new_width) / 2
+    pad_y = (size - new_height) / 2
+    left, top = round(pad_x - 0.1), round(pad_y - 0.1)
+
+    canvas = np.full((size, size, 3), PAD_VALUE, dtype=np.uint8)
+    canvas[top : top + new_height, left : left + new_width] = image
+    # BGR HWC -> RGB CHW
+    tensor = canvas[:, :, ::-1].transpose(2, 0, 1).astype(np.float32)
+    tensor /= 255
+    return tensor, scale, (left, top)
+
+
+def box_iou(
+    box: npt.NDArray[np.float32], boxes: npt.NDArray[np.float32]
+) -> npt.NDArray[np.float32]:
+    """Intersection over union of one box with many."""
+    top_left = np.maximum(box[:2], boxes[:, :2])
+    bottom_right = np.minimum(box[2:], boxes[:, 2:])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=1)
+    area = np.prod(box[2:] - box[:2])
+    areas = np.prod(boxes[:, 2:] - boxes[:, :2], axis=1)
+    return inter / (area + areas - inter + 1e-9)
+
+
+def nms(
+    boxes: npt.NDArray[np.float32],
+    scores: npt.NDArray[np.float32],
+    classes: npt.NDArray[np.int64],
+    iou: float = IOU,
+    max_detections: int = MAX_DETECTIONS,
+) -> npt.NDArray[np.int64]:
+    """Class-aware non-maximum suppression.
+
+    Boxes of different classes are offset so they never overlap, then every
+    kept box suppresses all remaining boxes at once.
+
+    Returns:
+        npt.NDArray[np.int64]: Indices of the kept boxes, best first.
+    """
+    offset = boxes + (classes[:, np.newaxis] * (boxes.max(initial=0) + 1))
+    order = np.argsort(-scores, kind="stable")
+    keep: list[int] = []
+    while order.size and len(keep) < max_detections:
+        best, rest = order[0], order[1:]
+        keep.append(int(best))
+        order = rest[box_iou(offset[best], offset[rest]) <= iou]
+    return np.array(keep, dtype=np.int64)
+
+
+def center_nms(
+    boxes: npt.NDArray[np.float32],
+    scores: npt.NDArray[np.float32],
+    classes: npt.NDArray[np.int64],
+) -> npt.NDArray[np.int64]:
+    """Class-aware suppression of boxes whose centers lie inside each other.
+
+    A card cut off at the edge of one crop and whole in a neighbouring one
+    gives two boxes of low IoU, but the center of one still falls in the other.
+
+    Returns:
+        npt.NDArray[np.int64]: Indices of the kept boxes, best first.
+    """
+    centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+    order = np.argsort(-scores, kind="stable")
+    keep: list[int] = []
+    while order.size:
+        best, rest = order[0], order[1:]
+        keep.append(int(best))
+        box, center, others = boxes[best], centers[best], boxes[rest]
+        inside_best = ((centers[rest] >= box[:2]) & (centers[rest] <= box[2:])).all(1)
+        best_inside = ((center >= others[:, :2]) & (center <= others[:, 2:])).all(1)
+        same_class = classes[rest] == classes[best]
+        order = rest[~((inside_best | best_inside) & same_class)]
+    return np.array(keep, dtype=np.int64)
+
+
+def decode(
+    output: npt.NDArray[np.float32],
+    scale: float,
+    pad: tuple[float, float],
+    confidence: float = CONFIDENCE,
+    iou: float = IOU,
+) -> Detections:
+    """Turns one image's raw YOLO output into detections.
+
+    Args:
+        output: `(4 + classes, anchors)` box centers, sizes and class scores.
+        scale: Scale `letterbox` applied to the image.
+        pad: Padding `letterbox` added before the image.
+        confidence: Lowest class score kept.
+        iou: NMS overlap threshold.
+
+    Returns:
+        Detections: Boxes in the original image's coordinates.
+    """
+    predictions = output.T
+    class_scores = predictions[:, 4:]
+    classes = class_scores.argmax(axis=1)
+    scores = class_scores[np.arange(len(classes)), classes]
+    mask = scores >= confidence
+    if not mask.any():
+        return Detections.empty()
+    xywh, scores, classes = predictions[mask, :4], scores[mask], classes[mask]
+
+    boxes = np.empty_like(xywh)
+    boxes[:, :2] = xywh[:, :2] - xywh[:, 2:] / 2
+    boxes[:, 2:] = xywh[:, :2] + xywh[:, 2:] / 2
+    keep = nms(boxes, scores, classes, iou)
+    boxes = (boxes[keep] - np.tile(pad, 2)) / scale
+    return Detections(
+        boxes.astype(np.float32),
+        scores[keep].astype(np.float32),
+        classes[keep].astype(np.int64),
+    )
+
+
+def model_hash(path: Path) -> str:
+    """Short content hash of a weights file."""
+    digest = hashlib.sha256()
+    with path.open("rb") as weights:
+        for chunk in iter(lambda: weights.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def export_onnx(
+    model_path: Path = MODEL_PATH,
+    cache_dir: Path = CACHE_DIR,
+    image_size: int = IMAGE_SIZE,
+) -> Path:
+    """Exports weights to a slimmed ONNX graph unless it is already cached.
+
+    Args:
+        model_path: YOLO weights.
+        cache_dir: Directory of exported graphs.
+        image_size: Side of the square model input.
+
+    Returns:
+        Path: Cached ONNX graph.
+    """
+    cached = cache_dir / f"{model_path.stem}-{model_hash(model_path)}-{image_size}.onnx"
+    if cached.exists():
+        return cached
+
+    import onnxslim
+    from ultralytics import YOLO
+
+    logger.info("Exporting %s to ONNX, this happens once per model", model_path)
+    exported = Path(
+        YOLO(model_path).export(format="onnx", imgsz=image_size, dynamic=True)
+    )
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    partial = cached.with_suffix(".partial")
+    try:
+        onnxslim.slim(str(exported), str(partial))
+    except Exception as e:  # slimming is an optimization, keep the plain graph
+        logger.warning("Could not slim %s: %s", exported, e)
+        shutil.copyfile(exported, partial)
+    partial.replace(cached)
+    return cached
+
+
+class UltralyticsBackend:
+    """Runs the weights through `ultralytics.YOLO`."""
+
+    def __init__(
+        self,
+        model_path: Path = MODEL_PATH,
+        confidence: float = CONFIDENCE,
+        image_size: int = IMAGE_SIZE,
+    ) -> None:
+        from ultralytics import YOLO
+
+        self.model = YOLO(model_path)
+        self.names: Mapping[int, str] = self.model.names
+        self.confidence = confidence
+        self.image_size = image_size
+
+    def predict(self, image: npt.NDArray[np.uint8]) -> Detections:
+        """Detects cards in one BGR image."""
+        return self.predict_batch([image])[0]
+
+    def predict_batch(
+        self, images: Sequence[npt.NDArray[np.uint8]]
+    ) -> list[Detections]:
+        """Detects cards in several BGR images at once."""
+        results = self.model.predict(
+            list(images), conf=self.confidence, imgsz=self.image_size, verbose=False
+        )
+        return [
+            Detections(
+                result.boxes.xyxy.cpu().numpy().astype(np.float32),
+                result.boxes.conf.cpu().numpy().astype(np.float32),
+                result.boxes.cls.cpu().numpy().astype(np.int64),
+            )
+            for result in results
+        ]
+
+
+class OnnxBackend:
+    """Runs an exported graph with ONNX Runtime on the CPU."""
+
+    def __init__(
+        self,
+        onnx_path: Path,
+        confidence: float = CONFIDENCE,
+        iou: float = IOU,
+        image_size: int = IMAGE_SIZE,
+        threads: int = 0,
+    ) -> None:
+        """Opens an inference session.
+
+        Args:
+            onnx_path: Exported graph.
+            confidence: Lowest class score kept.
+            iou: NMS overlap threshold.
+            image_size: Side of the square model input.
+            threads: Intra-op threads, 0 lets ONNX Runtime decide.
+        """
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            str(onnx_path), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        # ultralytics stores the class names as a dict literal
+        self.names: Mapping[int, str] = (
+            ast.literal_eval(metadata["names"])
+            if "names" in metadata
+            else dict(enumerate(sorted(encoding.LABELS)))
+        )
+        self.confidence = confidence
+        self.iou = iou
+        self.image_size = image_size
+
+    def predict(self, image: npt.NDArray[np.uint8]) -> Detections:
+        """Detects cards in one BGR image."""
+        return self.predict_batch([image])[0]
+
+    def predict_batch(
+        self, images: Sequence[npt.NDArray[np.uint8]]
+    ) -> list[Detections]:
+        """Detects cards in several BGR images with one forward pass."""
+        if not images:
+            return []
+        inputs = [letterbox(image, self.image_size) for image in images]
+        batch = np.stack([tensor for tensor, _, _ in inputs])
+        (outputs,) = self.session.run(None, {self.input_name: batch})
+        return [
+            decode(output, scale, pad, self.confidence, self.iou)
+            for output, (_, scale, pad) in zip(outputs, inputs)
+        ]
+
+
+def crop_boxes(
+    regions: npt.NDArray[np.float32],
+    shape: tuple[int, ...],
+    margin: float = 0.1,
+) -> npt.NDArray[np.int64]:
+    """Pixel crops around region boxes, grown by a margin and clipped.
+
+    Args:
+        regions: `(regions, 4)` boxes, rows with NaN are skipped.
+        shape: Shape of the frame.
+        margin: Share of each box side added on every side, so cards on a
+            region's edge are not cut off.
+
+    Returns:
+        npt.NDArray[np.int64]: `(crops, 4)` x min, y min, x max, y max.
+    """
+    known = regions[~np.isnan(regions).any(axis=1)]
+    grow = np.tile((known[:, 2:] - known[:, :2]) * margin, 2) * [-1, -1, 1, 1]
+    crops = np.round(known + grow).astype(np.int64)
+    height, width = shape[:2]
+    np.clip(crops, 0, [width, height, width, height], out=crops)
+    return crops[(crops[:, 2] > crops[:, 0]) & (crops[:, 3] > crops[:, 1])]
+
+
+def predict_crops(
+    model: Backend,
+    image: npt.NDArray[np.uint8],
+    crops: npt.NDArray[np.int64],
+    scale: float = 1.0,
+) -> Detections:
+    """Runs the model on crops of a frame only, in one batch.
+
+    Args:
+        model: Card model backend.
+        image: Full BGR frame.
+        crops: `(crops, 4)` pixel boxes from `crop_boxes`.
+        scale: Factor every crop is resized by before inference.
+
+    Returns:
+        Detections: Boxes of every crop in the frame's coordinates. A card
+        found in more than one crop keeps only its best box, see `center_nms`.
+    """
+    images = []
+    for x_min, y_min, x_max, y_max in crops.tolist():
+        crop = image[y_min:y_max, x_min:x_max]
+        if scale != 1.0:
+            crop = np.asarray(
+                cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            )
+        images.append(crop)
+    found = model.predict_batch(images)
+    if not found:
+        return Detections.empty()
+    # undo the resize, then move from crop to frame coordinates
+    sizes = np.array([[img.shape[1], img.shape[0]] for img in images])
+    factors = np.tile((crops[:, 2:] - crops[:, :2]) / sizes, 2)
+    boxes = [
+        detections.boxes * factor + np.tile(crop[:2], 2)
+        for detections, factor, crop in zip(found, factors, crops)
+    ]
+    merged = Detections(
+        np.concatenate(boxes).astype(np.float32),
+        np.concatenate([detections.scores for detections in found]),
+        np.concatenate([detections.classes for detections in found]),
+    )
+    if len(found) == 1:
+        return merged
+    keep = center_nms(merged.boxes, merged.scores, merged.classes)
+    return Detections(merged.boxes[keep], merged.scores[keep], merged.classes[keep])
+
+
+BACKENDS = ("ultralytics", "onnx")
+
+
+def make_backend(
+    backend: str = "ultralytics",
+    model_path: Path = MODEL_PATH,
+    confidence: float = CONFIDENCE,
+    cache_dir: Path = CACHE_DIR,
+    **kwargs: Any,
+) -> Backend:
+    """Builds a card model backend by name.
+
+    Args:
+        backend: One of `BACKENDS`.
+        model_path: YOLO weights, or an ONNX graph for the `onnx` backend.
+        confidence: Lowest box confidence kept.
+        cache_dir: Directory of exported ONNX graphs.
+        kwargs: Further options of the backend class.
+
+    Returns:
+        Backend: Ready to predict.
+    """
+    match backend:
+        case "ultralytics":
+            return UltralyticsBackend(model_path, confidence, **kwargs)
+        case "onnx":
+            onnx_path = (
+                model_path
+                if model_path.suffix == ".onnx"
+                else export_onnx(
+                    model_path, cache_dir, kwargs.get("image_size", IMAGE_SIZE)
+                )
+            )
+            return OnnxBackend(onnx_path, confidence, **kwargs)
+    raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
@@ -0,0 +1,210 @@
+"""Seat layout of a table and assignment of cards to seats.
+
+Every seat is a quadrilateral on the felt, marked either by two AprilTags on
+opposite corners or by four tags on its corners. When the layout also gives
+where the anchor tags sit on the table, a table to image homography is fit
+once per camera, so seats seen at an angle are projected as the skewed
+quadrilaterals they are. Cards are assigned to every seat at once with a
+broadcast point in polygon test.
+"""
+
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+
+import cv2
+import numpy as np
+import numpy.typing as npt
+import tomli
+
+HOMOGRAPHY_TOLERANCE = 1.0  # anchor pixels moved before the homography is refit
+
+
+@dataclass(frozen=True)
+class SeatRegion:
+    """Table area marked by AprilTags.
+
+    Attributes:
+        name: Name of the seat.
+        tag_ids: Two tags on opposite corners, or four tags on the corners in
+            order around the seat.
+        polygon: Four corners of the seat on the table, in the units of the
+            layout's anchor positions. Overrides the tags' positions once
+            the homography is known.
+    """
+
+    name: str
+    tag_ids: tuple[int, ...]
+    polygon: tuple[tuple[float, float], ...] | None = None
+
+    def __post_init__(self) -> None:
+        if len(self.tag_ids) not in (2, 4):
+            raise ValueError(f"Seat {self.name} needs 2 or 4 tags, not {self.tag_ids}")
+        if self.polygon is not None and len(self.polygon) != 4:
+            raise ValueError(f"Seat {self.name} polygon needs 4 corners")
+
+
+# published in this order, players first and the dealer last
+REGIONS = (SeatRegion("player", (21, 22)), SeatRegion("dealer", (23, 24)))
+
+
+@dataclass(frozen=True)
+class TableLayout:
+    """Seats of a table and, optionally, where its anchor tags are."""
+
+    regions: tuple[SeatRegion, ...] = REGIONS
+    # tag id -> center of the tag on the table, in any unit
+    anchors: Mapping[int, tuple[float, float]] | None = None
+
+    @classmethod
+    def load(cls, path: Path) -> "TableLayout":
+        """Reads a layout from a TOML file.
+
+        The file has a `[[seats]]` table per seat with `name`, `tags` and an
+        optional `polygon`, and an optional `[anchors]` table mapping tag ids
+        to their `[x, y]` table positions.
+        """
+        data = tomli.loads(path.read_text(encoding="utf-8"))
+        regions = tuple(
+            SeatRegion(
+                seat["name"],
+                tuple(seat["tags"]),
+                tuple(map(tuple, seat["polygon"])) if "polygon" in seat else None,
+            )
+            for seat in data["seats"]
+        )
+        anchors = data.get("anchors")
+        if anchors is not None:
+            anchors = {int(tag): (x, y) for tag, (x, y) in anchors.items()}
+        return cls(regions, anchors)
+
+
+def points_in_polygons(
+    points: npt.NDArray[np.float32], polygons: npt.NDArray[np.float32]
+) -> npt.NDArray[np.bool_]:
+    """Which points fall in which convex polygons.
+
+    Args:
+        points: `(points, 2)` image points.
+        polygons: `(polygons, corners, 2)` convex polygons with their corners
+            in order, either way round. Polygons with NaN contain nothing.
+
+    Returns:
+        npt.NDArray[np.bool_]: `(polygons, points)` membership mask.
+    """
+    edges = np.roll(polygons, -1, axis=1) - polygons  # (N, K, 2)
+    offsets = (
+        points[np.newaxis, np.newaxis] - polygons[:, :, np.newaxis]
+    )  # (N, K, M, 2)
+    cross = (
+        edges[:, :, np.newaxis, 0] * offsets[..., 1]
+        - edges[:, :, np.newaxis, 1] * offsets[..., 0]
+    )
+    with np.errstate(invalid="ignore"):
+        return (cross >= 0).all(axis=1) | (cross <= 0).all(axis=1)
+
+
+def polygon_boxes(polygons: npt.NDArray[np.float32]) -> npt.NDArray[np.float32]:
+    """`(polygons, 4)` bounding boxes as x min, y min, x max, y max."""
+    return np.concatenate((polygons.min(axis=1), polygons.max(axis=1)), axis=1)
+
+
+class SeatPolygons:
+    """Image quadrilaterals of a camera's seats, kept across frames."""
+
+    def __init__(self, layout: TableLayout) -> None:
+        """Sets up the seats as unknown.
+
+        Args:
+            layout: Seats and anchor positions of the table.
+        """
+        self.layout = layout
+        self.regions = list(layout.regions)
+        # (seats, 4, 2) image corners, NaN while a seat has never been seen
+        self.polygons = np.full((len(self.regions), 4, 2), np.nan, dtype=np.float32)
+        self.homography: npt.NDArray[np.float64] | None = None
+        self._projected: npt.NDArray[np.float32] | None = None
+        self._fit_centers: npt.NDArray[np.float64] | None = None
+        self._table_polygons = self._layout_polygons()
+
+    def _layout_polygons(self) -> npt.NDArray[np.float32]:
+        """`(seats, 4, 2)` table corners of the seats, NaN where unknown."""
+        table = np.full((len(self.regions), 4, 2), np.nan, dtype=np.float32)
+        anchors = self.layout.anchors or {}
+        for i, region in enumerate(self.regions):
+            if region.polygon is not None:
+                table[i] = region.polygon
+            elif all(tag in anchors for tag in region.tag_ids):
+                corners = np.array([anchors[tag] for tag in region.tag_ids])
+                if len(corners) == 2:
+                    (x0, y0), (x1, y1) = corners
+                    corners = np.array([(x0, y0), (x1, y0), (x1, y1), (x0, y1)])
+                table[i] = corners
+        return table
+
+    def _fit(self, tags: Mapping[int, npt.NDArray[np.float64]]) -> None:
+        """Refits the homography if the visible anchors moved."""
+        anchors = self.layout.anchors
+        if not anchors:
+            return
+        seen = [tag for tag in sorted(anchors) if tag in tags]
+        if len(seen) < 4:
+            return
+        centers = np.array([tags[tag].mean(axis=0) for tag in seen])
+        if (
+            self._fit_centers is not None
+            and self._fit_centers.shape == centers.shape
+            and np.abs(self._fit_centers - centers).max() < HOMOGRAPHY_TOLERANCE
+        ):
+            return
+        table = np.array([anchors[tag] for tag in seen], dtype=np.float64)
+        homography, _ = cv2.findHomography(table, centers)
+        if homography is not None:
+            self.homography = np.asarray(homography, dtype=np.float64)
+            self._fit_centers = centers
+            projected = cv2.perspectiveTransform(
+                self._table_polygons.reshape(-1, 1, 2), self.homography
+            )
+            self._projected = np.asarray(projected, dtype=np.float32).reshape(
+                self.polygons.shape
+            )
+
+    def update(
+        self, tags: Mapping[int, npt.NDArray[np.float64]]
+    ) -> npt.NDArray[np.float32]:
+        """Updates the seats from the tags seen in a frame.
+
+        Seats with table corners are placed by the homography once it is
+        known. Other seats whose tags are not all visible keep their
+        previous corners.
+
+        Args:
+            tags: Corners of the visible region tags.
+
+        Returns:
+            npt.NDArray[np.float32]: `(seats, 4, 2)` image corners of the seats.
+        """
+        self._fit(tags)
+        projected = self._projected
+        for i, region in enumerate(self.regions):
+            if projected is not None and not np.isnan(projected[i]).any():
+                self.polygons[i] = projected[i]
+            elif all(tag in tags for tag in region.tag_ids):
+                self.polygons[i] = _tag_polygon([tags[tag] for tag in region.tag_ids])
+        return self.polygons
+
+    def boxes(self) -> npt.NDArray[np.float32]:
+        """`(seats, 4)` bounding boxes of the seats, NaN where unknown."""
+        return polygon_boxes(self.polygons)
+
+
+def _tag_polygon(corners: Sequence[npt.NDArray[np.float64]]) -> npt.NDArray[np.float32]:
+    """Image quadrilateral spanned by a seat's tags."""
+    if len(corners) == 2:
+        x_min, y_min = np.concatenate(corners).min(axis=0)
+        x_max, y_max = np.concatenate(corners).max(axis=0)
+        return np.array(
+            [(x_min, y_min), (x_max, y_min), (x_max, y_max), (x_min, y_max)],
+            dtype=np.float32,
+        )
+    return np.array([tag.mean(axis=0) for tag in corners], dtype=np.float32)
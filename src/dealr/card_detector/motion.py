@@ -0,0 +1,101 @@
+"""Cheap per-region change detection between camera frames.
+
+Most of a round the table does not move, so there is nothing new to detect.
+Each seat region of a small grayscale copy of the frame is compared with the
+same region when it was last examined, and only regions that changed, plus
+all of them every few seconds, are passed on to tag and card detection.
+"""
+
+import time
+
+import cv2
+import numpy as np
+import numpy.typing as npt
+
+SCALE = 0.25  # downscale factor of the compared frames
+THRESHOLD = 16  # gray level difference counted as a changed pixel
+MIN_CHANGE = 0.01  # share of changed pixels that marks a region as changed
+
+
+class MotionGate:
+    """Decides which seat regions of a frame need detection."""
+
+    def __init__(
+        self,
+        num_regions: int,
+        scale: float = SCALE,
+        threshold: int = THRESHOLD,
+        min_change: float = MIN_CHANGE,
+        hold: int = 5,
+        refresh: float = 2.0,
+    ) -> None:
+        """Sets up the gate with every region unseen.
+
+        Args:
+            num_regions: Number of seat regions.
+            scale: Downscale factor of the compared frames.
+            threshold: Gray level difference counted as a changed pixel.
+            min_change: Share of changed pixels that marks a region as changed.
+            hold: Frames a region stays active after its last change, so the
+                trackers see a settled card often enough to confirm or drop it.
+            refresh: Seconds between frames with every region active.
+        """
+        self.scale = scale
+        self.threshold = threshold
+        self.min_change = min_change
+        self.hold = hold
+        self.refresh = refresh
+        self.references: list[npt.NDArray[np.uint8] | None] = [None] * num_regions
+        self.countdown = np.zeros(num_regions, dtype=np.int64)
+        self.last_refresh = -np.inf
+
+    def update(
+        self,
+        gray: npt.NDArray[np.uint8],
+        boxes: npt.NDArray[np.float32],
+        now: float | None = None,
+    ) -> npt.NDArray[np.bool_]:
+        """Compares a frame with the regions' references.
+
+        Args:
+            gray: Full resolution grayscale frame.
+            boxes: `(regions, 4)` region boxes, NaN while a region is unknown.
+            now: Monotonic time of the frame, the current time if None.
+
+        Returns:
+            npt.NDArray[np.bool_]: Regions to run detection on.
+        """
+        now = time.monotonic() if now is None else now
+        small: npt.NDArray[np.uint8] = np.asarray(
+            cv2.resize(
+                gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA
+            ),
+            dtype=np.uint8,
+        )
+        known = ~np.isnan(boxes).any(axis=1)
+        scaled = np.zeros(boxes.shape, dtype=np.int64)
+        scaled[known] = np.round(boxes[known] * self.scale)
+        np.clip(scaled, 0, [small.shape[1], small.shape[0]] * 2, out=scaled)
+
+        changed = ~known
+        if now - self.last_refresh >= self.refresh:
+            changed[:] = True
+            self.last_refresh = now
+        for i, (x_min, y_min, x_max, y_max) in enumerate(scaled.tolist()):
+            if not known[i]:
+                continue
+            patch = small[y_min:y_max, x_min:x_max]
+            reference = self.references[i]
+            if reference is None or reference.shape != patch.shape:
+                changed[i] = True
+            elif not changed[i]:
+                diff = cv2.absdiff(patch, reference)
+                moved = np.count_nonzero(diff > self.threshold)
+                changed[i] = moved >= self.min_change * diff.size
+            if changed[i]:
+                self.references[i] = patch.copy()
+
+        self.countdown[changed] = self.hold
+        active = self.countdown > 0
+        self.countdown[active] -= 1
+        return active
@@ -0,0 +1,655 @@
+"""Headless card detection service publishing per-seat hands.
+
+Capture, AprilTag detection, card detection and region assignment run as
+threads connected by bounded queues. A stage that falls behind never builds a
+backlog: when its queue is full the oldest frame is dropped in favour of the
+newest, so published hands always come from a recent frame.
+"""
+
+import argparse
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import cv2
+import numpy as np
+import numpy.typing as npt
+import pupil_apriltags as apriltag
+import tomli
+import zmq
+
+from dealr.blackjack import encoding
+from dealr.card_detector import inference, wire
+from dealr.card_detector.anchors import AnchorCache
+from dealr.card_detector.inference import CONFIDENCE, MODEL_PATH
+from dealr.card_detector.layout import (
+    SeatPolygons,
+    TableLayout,
+    points_in_polygons,
+)
+from dealr.card_detector.motion import MotionGate
+from dealr.card_detector.rectify import Rectifier
+from dealr.card_detector.sources import open_source
+from dealr.card_detector.timing import StageTimings, StatsServer
+from dealr.card_detector.tracker import DetectionScheduler, TableTracker
+
+logger = logging.getLogger(__name__)
+
+PORTS_PATH = Path(__file__).parents[1] / "ports.toml"
+TAG_FAMILY = "tag25h9"
+
+
+@dataclass
+class FrameResult:
+    """One camera frame and everything detected in it so far."""
+
+    seq: int
+    timestamp_ns: int
+    image: npt.NDArray[np.uint8]
+    tags: dict[int, npt.NDArray[np.float64]] = field(default_factory=dict)
+    card_ids: npt.NDArray[np.uint8] = field(
+        default_factory=lambda: np.empty(0, dtype=np.uint8)
+    )
+    card_centers: npt.NDArray[np.float32] = field(
+        default_factory=lambda: np.empty((0, 2), dtype=np.float32)
+    )
+    # (regions, 4) seat region boxes, NaN while a region has never been seen
+    regions: npt.NDArray[np.float32] = field(
+        default_factory=lambda: np.empty((0, 4), dtype=np.float32)
+    )
+    # (regions, 4, 2) seat region corners, NaN while a region has never been seen
+    polygons: npt.NDArray[np.float32] = field(
+        default_factory=lambda: np.empty((0, 4, 2), dtype=np.float32)
+    )
+    detected: bool = True  # False when card detection skipped this frame
+    # regions examined in this frame, None for all of them
+    active: npt.NDArray[np.bool_] | None = None
+    # table to image homography of the layout, None until it is calibrated
+    homography: npt.NDArray[np.float64] | None = None
+
+
+def make_tag_detector() -> apriltag.Detector:
+    """AprilTag detector with the settings used across the card detector."""
+    return apriltag.Detector(
+        families=TAG_FAMILY,
+        nthreads=4,
+        quad_decimate=1.0,
+        quad_sigma=0.0,
+        refine_edges=True,
+        decode_sharpening=0.25,
+    )
+
+
+class TagStage:
+    """Finds region tags and, optionally, cards marked with AprilTags."""
+
+    def __init__(
+        self,
+        layout: TableLayout,
+        cards_from_tags: bool = False,
+        motion: MotionGate | None = None,
+        anchor_recheck: float | None = None,
+        timings: StageTimings | None = None,
+    ) -> None:
+        """Sets up the detector.
+
+        Args:
+            layout: Seat regions in publishing order and anchor positions.
+            cards_from_tags: Read the cards from tags 0-51 instead of YOLO.
+            motion: Gate limiting detection to the regions that changed.
+            anchor_recheck: Seconds between checks of the cached region tag
+                corners, or None to find the region tags in every frame.
+            timings: Histograms the stage's steps are timed into.
+        """
+        self.detector = make_tag_detector()
+        self.regions = list(layout.regions)
+        self.region_tags = frozenset(
+            tag for region in self.regions for tag in region.tag_ids
+        ).union(layout.anchors or ())
+        self.seats = SeatPolygons(layout)
+        self.boxes = self.seats.boxes()
+        self.cards_from_tags = cards_from_tags
+        self.motion = motion
+        self.anchors = (
+            None
+            if anchor_recheck is None
+            else AnchorCache(self.region_tags, self.detector, anchor_recheck)
+        )
+        self.timings = StageTimings() if timings is None else timings
+
+    def detect(
+        self, gray: npt.NDArray[np.uint8], active: npt.NDArray[np.bool_] | None = None
+    ) -> dict[int, tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]]:
+        """Finds tags in the whole frame or in crops around active regions.
+
+        Args:
+            gray: Grayscale frame.
+            active: Regions to look in, None for the whole frame. The whole
+                frame is searched too while one of them is unknown.
+
+        Returns:
+            dict: Corners and center of every tag found, by tag id.
+        """
+        if active is None or np.isnan(self.boxes[active]).any():
+            return {
+                det.tag_id: (det.corners, det.center)
+                for det in self.detector.detect(gray)
+            }
+        found = {}
+        for x_min, y_min, x_max, y_max in inference.crop_boxes(
+            self.boxes[active], gray.shape
+        ).tolist():
+            crop = np.ascontiguousarray(gray[y_min:y_max, x_min:x_max])
+            offset = np.array([x_min, y_min], dtype=np.float64)
+            for det in self.detector.detect(crop):
+                found[det.tag_id] = (det.corners + offset, det.center + offset)
+        return found
+
+    def _update_regions(self, tags: dict[int, npt.NDArray[np.float64]]) -> None:
+        self.seats.update(tags)
+        self.boxes = self.seats.boxes()
+
+    def _set_regions(self, result: FrameResult) -> None:
+        result.polygons = self.seats.polygons.copy()
+        result.regions = self.boxes.copy()
+        result.homography = self.seats.homography
+
+    def __call__(self, result: FrameResult) -> FrameResult:
+        with self.timings.timer("gray"):
+            gray: npt.NDArray[np.uint8] = np.asarray(
+                cv2.cvtColor(result.image, cv2.COLOR_BGR2GRAY), dtype=np.uint8
+            )
+        if self.motion is not None:
+            with self.timings.timer("motion"):
+                result.active = self.motion.update(gray, self.boxes)
+            if not result.active.any():
+                self._set_regions(result)
+                result.detected = False
+                return result
+        with self.timings.timer("tags"):
+            return self._tags(result, gray)
+
+    def _tags(self, result: FrameResult, gray: npt.NDArray[np.uint8]) -> FrameResult:
+        active = result.active
+        if self.anchors is not None:
+            result.tags = dict(self.anchors.locate(gray))
+            self._update_regions(result.tags)
+            if not self.cards_from_tags:
+                self._set_regions(result)
+                return result
+            # cards are only looked for around the cached regions
+            if active is None:
+                active = np.ones(len(self.regions), dtype=bool)
+        elif active is not None and active.all():
+            active = None  # the whole frame costs about as much as every crop
+        found = self.detect(gray, active)
+        if self.anchors is None:
+            result.tags = {
+                tag_id: corners
+                for tag_id, (corners, _) in found.items()
+                if tag_id in self.region_tags
+            }
+            self._update_regions(result.tags)
+        self._set_regions(result)
+        if self.cards_from_tags:
+            card_tags = [
+                tag_id
+                for tag_id in found
+                if tag_id < encoding.NUM_CARDS and tag_id not in self.region_tags
+            ]
+            result.card_ids = encoding.tags_to_ids(card_tags)
+            result.card_centers = np.array(
+                [found[tag_id][1] for tag_id in card_tags], dtype=np.float32
+            ).reshape(-1, 2)
+        return result
+
+
+class YoloStage:
+    """Finds cards with the trained YOLO model."""
+
+    def __init__(
+        self,
+        model_path: Path = MODEL_PATH,
+        confidence: float = CONFIDENCE,
+        backend: str = "ultralytics",
+        roi: bool = False,
+        roi_scale: float = 1.0,
+        detect_every: int = 1,
+        rectifier: Rectifier | None = None,
+        image_size: int = inference.IMAGE_SIZE,
+        timings: StageTimings | None = None,
+    ) -> None:
+        """Loads the model.
+
+        Args:
+            model_path: YOLO weights.
+            confidence: Lowest box confidence kept.
+            backend: Inference backend in `inference.BACKENDS`.
+            roi: Only look for cards in crops around the seat regions, once
+                they are known.
+            roi_scale: Factor the crops are resized by before inference.
+            detect_every: Run the model on every `detect_every`-th frame only;
+                the seat trackers hold the hands in between.
+            rectifier: Runs the model on a top-down view of the table once
+                the layout is calibrated, instead of on the frame.
+            image_size: Side of the square model input.
+            timings: Histograms the model runs are timed into.
+        """
+        self.backend = inference.make_backend(
+            backend, model_path, confidence, image_size=image_size
+        )
+        self.class_ids = encoding.yolo_class_table(self.backend.names)
+        self.roi = roi
+        self.roi_scale = roi_scale
+        self.scheduler = DetectionScheduler(detect_every)
+        self.rectifier = rectifier
+        self.timings = StageTimings() if timings is None else timings
+
+    def __call__(self, result: FrameResult) -> FrameResult:
+        if not result.detected or not self.scheduler.should_detect():
+            result.detected = False
+            return result
+        if self.rectifier is not None and result.homography is not None:
+            with self.timings.timer("rectify"):
+                view = self.rectifier.warp(result.image, result.homography)
+            with self.timings.timer("cards"):
+                detections = self.backend.predict(view)
+            result.card_ids = encoding.classes_to_ids(
+                detections.classes, self.class_ids
+            )
+            result.card_centers = self.rectifier.to_image(
+                detections.centers, result.homography
+            )
+            return result
+        regions = result.regions
+        if result.active is not None:
+            regions = regions[result.active]
+        crops = inference.crop_boxes(regions, result.image.shape) if self.roi else None
+        with self.timings.timer("cards"):
+            if crops is not None and len(crops):
+                detections = inference.predict_crops(
+                    self.backend, result.image, crops, self.roi_scale
+                )
+            else:
+                detections = self.backend.predict(result.image)
+        result.card_ids = encoding.classes_to_ids(detections.classes, self.class_ids)
+        result.card_centers = detections.centers
+        return result
+
+
+def offer(channel: "queue.Queue[Any]", item: Any) -> bool:
+    """Puts an item on a bounded queue, dropping the oldest one if it is full.
+
+    Returns:
+        bool: Whether an older item was dropped.
+    """
+    dropped = False
+    while True:
+        try:
+            channel.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                channel.get_nowait()
+                dropped = True
+            except queue.Empty:
+                pass
+
+
+class Stage(threading.Thread):
+    """Thread that applies a function to every item of its input queue."""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[FrameResult], FrameResult | None],
+        inbox: "queue.Queue[FrameResult | None]",
+        outbox: "queue.Queue[FrameResult | None]",
+    ) -> None:
+        super().__init__(name=name, daemon=True)
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.processed = 0
+        self.dropped = 0  # items this stage pushed out of a full outbox
+
+    def run(self) -> None:
+        while True:
+            item = self.inbox.get()
+            if item is None:  # shutdown, pass it on
+                self.outbox.put(None)
+                return
+            try:
+                result = self.func(item)
+            except Exception:  # keep the pipeline alive on a bad frame
+                logger.exception("Stage %s failed on frame %d", self.name, item.seq)
+                continue
+            self.processed += 1
+            if result is not None and offer(self.outbox, result):
+                self.dropped += 1
+
+
+class DetectorService:
+    """Camera to per-seat hands pipeline publishing on a PUB socket."""
+
+    def __init__(
+        self,
+        port: int,
+        source: int | str | Path = 0,
+        table_id: int = 0,
+        layout: TableLayout | None = None,
+        model_path: Path | None = MODEL_PATH,
+        backend: str = "ultralytics",
+        roi: bool = False,
+        roi_scale: float = 1.0,
+        detect_every: int = 1,
+        confirm_after: int = 3,
+        drop_after: int = 5,
+        motion: bool = False,
+        refresh: float = 2.0,
+        anchor_recheck: float | None = None,
+        rectify_width: int | None = None,
+        image_size: int = inference.IMAGE_SIZE,
+        queue_size: int = 1,
+        keyframe_interval: float = 1.0,
+        use_pickle: bool = False,
+        stats_port: int | None = None,
+        stats_interval: float = 0.0,
+    ) -> None:
+        """Builds the pipeline stages.
+
+        Args:
+            port: Port to publish hands on.
+            source: Camera index, video file or image directory.
+            table_id: Id of the table sent in every message.
+            layout: Seat regions in publishing order and anchor positions,
+                the default player and dealer regions if None.
+            model_path: YOLO weights, or None to read cards from AprilTags.
+            backend: Inference backend in `inference.BACKENDS`.
+            roi: Run the card model on crops around the seat regions only.
+            roi_scale: Factor the crops are resized by before inference.
+            detect_every: Run the card model on every `detect_every`-th frame.
+            confirm_after: Detection passes in a row a card must be seen in
+                with the same label before it joins a hand or changes label.
+            drop_after: Detection passes a card must be missed in before it
+                leaves a hand.
+            motion: Only detect tags and cards in seat regions that changed
+                since they were last examined.
+            refresh: Seconds between frames examined in full when `motion`
+                is set.
+            anchor_recheck: Seconds between checks of the cached region tag
+                corners, or None to find the region tags in every frame.
+            rectify_width: Run the card model on a top-down view of the table
+                this many pixels wide. Needs a layout with anchor positions.
+            image_size: Side of the square card model input.
+            queue_size: Frames buffered between two stages.
+            keyframe_interval: Seconds between full table keyframes.
+            use_pickle: Publish pickled card lists for old subscribers.
+            stats_port: REP port answering with per-stage latency
+                percentiles, None for no stats socket.
+            stats_interval: Seconds between latency log lines, 0 to disable.
+        """
+        self.port = port
+        self.source = source
+        self.table_id = table_id
+        if layout is None:
+            layout = TableLayout()
+        self.regions = list(layout.regions)
+        self.keyframe_interval = keyframe_interval
+        self.use_pickle = use_pickle
+        self.running = threading.Event()
+        self.capture_dropped = 0
+        self.timings = StageTimings()
+        self.stats_port = stats_port
+        self.stats_interval = stats_interval
+        self.tracker = TableTracker(
+            len(self.regions), confirm_after=confirm_after, drop_after=drop_after
+        )
+
+        gate = None
+        if motion:
+            # keep changed regions active long enough to confirm or drop cards
+            hold = max(confirm_after, drop_after) * max(1, detect_every)
+            gate = MotionGate(len(self.regions), hold=hold, refresh=refresh)
+        funcs: list[tuple[str, Callable[[FrameResult], FrameResult | None]]] = [
+            (
+                "tags",
+                TagStage(
+                    layout,
+                    cards_from_tags=model_path is None,
+                    motion=gate,
+                    anchor_recheck=anchor_recheck,
+                    timings=self.timings,
+                ),
+            )
+        ]
+        if model_path is not None:
+            funcs.append(
+                (
+                    "cards",
+                    YoloStage(
+                        model_path,
+                        backend=backend,
+                        roi=roi,
+                        roi_scale=roi_scale,
+                        detect_every=detect_every,
+                        rectifier=(
+                            None
+                            if rectify_width is None
+                            else Rectifier.from_layout(layout, rectify_width)
+                        ),
+                        image_size=image_size,
+                        timings=self.timings,
+                    ),
+                )
+            )
+
+        self.queues: list[queue.Queue[FrameResult | None]] = [
+            queue.Queue(maxsize=queue_size) for _ in range(len(funcs) + 1)
+        ]
+        self.funcs = funcs
+        self.stages = [
+            Stage(name, func, inbox, outbox)
+            for (name, func), inbox, outbox in zip(funcs, self.queues, self.queues[1:])
+        ]
+
+    def hands(self, result: FrameResult) -> list[npt.NDArray[np.uint8]]:
+        """Confirmed card ids in every seat region after a frame."""
+        with self.timings.timer("assign"):
+            if result.detected:
+                mask = points_in_polygons(result.card_centers, result.polygons)
+                self.tracker.update(
+                    result.card_ids, result.card_centers, mask, result.active
+                )
+            return self.tracker.hands()
+
+    def process(
+        self, seq: int, image: npt.NDArray[np.uint8]
+    ) -> list[npt.NDArray[np.uint8]]:
+        """Runs every stage on a frame in the calling thread.
+
+        Returns:
+            list: Confirmed card ids in every seat region after the frame.
+        """
+        result = FrameResult(seq, time.time_ns(), image)
+        for _, func in self.funcs:
+            if (output := func(result)) is None:  # the stage dropped the frame
+                return self.tracker.hands()
+            result = output
+        return self.hands(result)
+
+    def _capture(self) -> None:
+        try:
+            source = open_source(self.source, latest=True)
+        except OSError:
+            logger.exception("Could not open frame source %s", self.source)
+            self.running.clear()
+            self.queues[0].put(None)
+            return
+        seq = 0
+        # the read blocks until the camera delivers, so only the handoff of
+        # a frame to the first stage is timed
+        handoff_timer = self.timings.timer("handoff")
+        with source:
+            while self.running.is_set():
+                stamped = source.read_stamped()
+                if stamped is None:
+                    logger.warning("Frame source %s ended", self.source)
+                    break
+                with handoff_timer:
+                    dropped = offer(self.queues[0], FrameResult(seq, *stamped))
+                if dropped:
+                    self.capture_dropped += 1
+                seq += 1
+            if source.dropped:
+                logger.warning("Camera skipped %d stale frames", source.dropped)
+        self.queues[0].put(None)
+
+    def serve(self) -> None:
+        """Runs the pipeline and publishes hands until `stop` is called."""
+        context = zmq.Context()
+        socket = context.socket(zmq.PUB)
+        socket.bind(f"tcp://*:{self.port}")
+        publisher = wire.HandsPublisher(
+            socket, self.table_id, self.keyframe_interval, self.use_pickle
+        )
+
+        stats = None
+        if self.stats_port is not None:
+            stats = StatsServer(self.timings, self.stats_port)
+            stats.start()
+
+        self.running.set()
+        capture = threading.Thread(target=self._capture, name="capture", daemon=True)
+        capture.start()
+        for stage in self.stages:
+            stage.start()
+
+        publish_timer = self.timings.timer("publish")
+        last_log = time.monotonic()
+        try:
+            while (result := self.queues[-1].get()) is not None:
+                hands = self.hands(result)
+                with publish_timer:
+                    publisher.publish(result.seq, result.timestamp_ns, hands)
+                # capture to publish, including time spent queued
+                self.timings.record("latency", time.time_ns() - result.timestamp_ns)
+                now = time.monotonic()
+                if self.stats_interval and now - last_log >= self.stats_interval:
+                    last_log = now
+                    logger.info("Stage ms p50/p95/p99: %s", self.timings.log_line())
+        finally:
+            self.stop()
+            if stats is not None:
+                stats.stop()
+            socket.close()
+
+    def stop(self) -> None:
+        """Stops capturing; the stages drain and exit."""
+        self.running.clear()
+
+
+def serve(
+    port: int,
+    source: int | str | Path = 0,
+    model_path: Path | None = MODEL_PATH,
+    **kwargs: Any,
+) -> None:
+    """Runs a detector service until interrupted.
+
+    Args:
+        port: Port to publish hands on.
+        source: Camera index, video file or image directory.
+        model_path: YOLO weights, or None to read cards from AprilTags.
+        kwargs: Further `DetectorService` options.
+    """
+    DetectorService(port, source, model_path=model_path, **kwargs).serve()
+
+
+def main() -> None:
+    """Command line driver for the headless detector service."""
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--source",
+        "--camera",
+        default="0",
+        help="camera index, video file or image directory",
+    )
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--table-id", type=int, default=0)
+    parser.add_argument("--model", type=Path, default=MODEL_PATH)
+    parser.add_argument(
+        "--tags", action="store_true", help="read cards from AprilTags, not YOLO"
+    )
+    parser.add_argument("--backend", choices=inference.BACKENDS, default="ultralytics")
+    parser.add_argument(
+        "--roi", action="store_true", help="detect cards in seat regions only"
+    )
+    parser.add_argument("--roi-scale", type=float, default=1.0)
+    parser.add_argument(
+        "--detect-every", type=int, default=1, help="run YOLO on every Nth frame"
+    )
+    parser.add_argument("--confirm-after", type=int, default=3)
+    parser.add_argument("--drop-after", type=int, default=5)
+    parser.add_argument(
+        "--motion", action="store_true", help="detect in changed seat regions only"
+    )
+    parser.add_argument("--refresh", type=float, default=2.0)
+    parser.add_argument(
+        "--anchor-recheck",
+        type=float,
+        default=None,
+        help="cache region tags and re-check them every this many seconds",
+    )
+    parser.add_argument("--layout", type=Path, help="seat layout TOML file")
+    parser.add_argument(
+        "--rectify",
+        type=int,
+        default=None,
+        metavar="WIDTH",
+        help="detect cards in a top-down view this many pixels wide",
+    )
+    parser.add_argument("--image-size", type=int, default=inference.IMAGE_SIZE)
+    parser.add_argument("--queue-size", type=int, default=1)
+    parser.add_argument("--keyframe-interval", type=float, default=1.0)
+    parser.add_argument(
+        "--stats", action="store_true", help="serve stage latencies over zmq"
+    )
+    parser.add_argument("--stats-interval", type=float, default=0.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    ports = tomli.loads(PORTS_PATH.read_text(encoding="utf-8"))
+    port = ports["card-detector"] if args.port is None else args.port
+    serve(
+        port,
+        args.source,
+        None if args.tags else args.model,
+        table_id=args.table_id,
+        layout=TableLayout.load(args.layout) if args.layout else None,
+        backend=args.backend,
+        roi=args.roi,
+        roi_scale=args.roi_scale,
+        detect_every=args.detect_every,
+        confirm_after=args.confirm_after,
+        drop_after=args.drop_after,
+        motion=args.motion,
+        refresh=args.refresh,
+        anchor_recheck=args.anchor_recheck,
+        rectify_width=args.rectify,
+        image_size=args.image_size,
+        queue_size=args.queue_size,
+        keyframe_interval=args.keyframe_interval,
+        stats_port=ports["card-detector-stats"] if args.stats else None,
+        stats_interval=args.stats_interval,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Top-down view of the table for card detection.
+
+The camera sees the felt at an angle, so cards at the far seats are small and
+skewed. Given the table to image homography of a calibrated layout, the
+rectifier warps every frame into a fixed size top-down image in which every
+card has the same scale, so the card model can run on a small input. The
+per-pixel lookup maps are built once per homography and reused for every
+frame until the calibration changes.
+"""
+
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+import numpy.typing as npt
+
+from dealr.card_detector.layout import TableLayout
+
+WIDTH = 640  # pixels across the rectified view
+MARGIN = 0.1  # share of the table bounds added on every side
+
+
+class Rectifier:
+    """Warps frames of one camera into a top-down view of the table."""
+
+    def __init__(
+        self,
+        bounds: tuple[float, float, float, float],
+        width: int = WIDTH,
+        cache_size: int = 4,
+    ) -> None:
+        """Sets up the view.
+
+        Args:
+            bounds: Table area shown, as x min, y min, x max, y max in the
+                layout's units.
+            width: Pixels across the view; the height keeps the aspect ratio.
+            cache_size: Calibrations whose maps are kept.
+        """
+        x_min, y_min, x_max, y_max = bounds
+        scale = width / (x_max - x_min)
+        self.size = (width, max(1, round((y_max - y_min) * scale)))
+        # view pixel -> table position
+        self.view_to_table = np.array(
+            [[1 / scale, 0, x_min], [0, 1 / scale, y_min], [0, 0, 1]],
+            dtype=np.float64,
+        )
+        self.cache_size = cache_size
+        self._maps: OrderedDict[
+            bytes, tuple[npt.NDArray[np.int16], npt.NDArray[np.uint16]]
+        ] = OrderedDict()
+
+    @classmethod
+    def from_layout(
+        cls, layout: TableLayout, width: int = WIDTH, margin: float = MARGIN
+    ) -> "Rectifier":
+        """View of everything the layout places on the table.
+
+        Raises:
+            ValueError: If the layout gives no anchor positions.
+        """
+        if not layout.anchors:
+            raise ValueError("Rectifying needs the anchor positions of the layout")
+        points = [*layout.anchors.values()]
+        for region in layout.regions:
+            points.extend(region.polygon or ())
+        low, high = np.min(points, axis=0), np.max(points, axis=0)
+        grow = (high - low) * margin
+        x_min, y_min = low - grow
+        x_max, y_max = high + grow
+        return cls((x_min, y_min, x_max, y_max), width)
+
+    def view_to_image(
+        self, homography: npt.NDArray[np.float64]
+    ) -> npt.NDArray[np.float64]:
+        """Homography from view pixels to frame pixels."""
+        return homography @ self.view_to_table
+
+    def maps(
+        self, homography: npt.NDArray[np.float64]
+    ) -> tuple[npt.NDArray[np.int16], npt.NDArray[np.uint16]]:
+        """`cv2.remap` lookup maps of a calibration, built on first use.
+
+        Args:
+            homography: Table to image homography of the camera.
+
+        Returns:
+            tuple: Fixed point maps from `cv2.convertMaps`.
+        """
+        key = homography.tobytes()
+        if key in self._maps:
+            self._maps.move_to_end(key)
+            return self._maps[key]
+
+        width, height = self.size
+        xs, ys = np.meshgrid(
+            np.arange(width, dtype=np.float32), np.arange(height, dtype=np.float32)
+        )
+        view = np.stack((xs, ys), axis=-1).reshape(-1, 1, 2)
+        image = cv2.perspectiveTransform(view, self.view_to_image(homography))
+        map_x = np.ascontiguousarray(image[:, 0, 0].reshape(height, width))
+        map_y = np.ascontiguousarray(image[:, 0, 1].reshape(height, width))
+        map1, map2 = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+        maps = (np.asarray(map1, dtype=np.int16), np.asarray(map2, dtype=np.uint16))
+
+        self._maps[key] = maps
+        if len(self._maps) > self.cache_size:
+            self._maps.popitem(last=False)
+        return maps
+
+    def warp(
+        self, image: npt.NDArray[np.uint8], homography: npt.NDArray[np.float64]
+    ) -> npt.NDArray[np.uint8]:
+        """Top-down view of a frame."""
+        map1, map2 = self.maps(homography)
+        return np.asarray(
+            cv2.remap(image, map1, map2, cv2.INTER_LINEAR), dtype=np.uint8
+        )
+
+    def to_image(
+        self, points: npt.NDArray[np.float32], homography: npt.NDArray[np.float64]
+    ) -> npt.NDArray[np.float32]:
+        """Maps `(points, 2)` view pixels back to frame pixels."""
+        if not len(points):
+            return points.astype(np.float32)
+        mapped = cv2.perspectiveTransform(
+            points.reshape(-1, 1, 2).astype(np.float64),
+            self.view_to_image(homography),
+        )
+        return np.asarray(mapped, dtype=np.float32).reshape(-1, 2)
@@ -1,31 +1,85 @@
 """Publisher of card detector data."""
 
-import itertools
 import random
 import time
+from pathlib import Path
 
 import zmq
 
-from dealr.blackjack import cards
+from dealr.blackjack import encoding
+from dealr.card_detector import pipeline, wire
 
 
-def serve(num_players: int, port: int):
+def serve(
+    port: int,
+    camera: int | str | Path = 0,
+    model_path: Path | None = pipeline.MODEL_PATH,
+    backend: str = "ultralytics",
+    roi: bool = False,
+    table_id: int = 0,
+    use_pickle: bool = False,
+    keyframe_interval: float = 1.0,
+):
     """Spawns publisher for card detector results.
-    Data is in the form of a 2D array where each
-    element is a list of the given player's hand.
+    Frames from the camera run through the detection
+    pipeline and the card ids in every seat region are
+    sent in the `wire` format.
+
+    Args:
+        port: Port to send data onto.
+        camera: Camera index, video file or image directory.
+        model_path: YOLO weights, or None to read cards from AprilTags.
+        backend: Inference backend, "ultralytics" or "onnx".
+        roi: Run the card model on crops around the seat regions only.
+        table_id: Id of the table sent in every message.
+        use_pickle: Publish pickled card lists for old subscribers.
+        keyframe_interval: Seconds between full table keyframes.
+    """
+    pipeline.serve(
+        port,
+        camera,
+        model_path,
+        backend=backend,
+        roi=roi,
+        table_id=table_id,
+        use_pickle=use_pickle,
+        keyframe_interval=keyframe_interval,
+    )
+
+
+def serve_random(
+    num_players: int,
+    port: int,
+    table_id: int = 0,
+    use_pickle: bool = False,
+    fps: float = 30.0,
+    keyframe_interval: float = 1.0,
+):
+    """Spawns publisher of random hands for running without a camera.
+    Data is sent in the `wire` format with the card ids
+    of every player's hand, only when a hand changes
+    and as a keyframe every `keyframe_interval` seconds.
 
     Args:
         num_players: Number of players to send on.
         port: Port to send data onto.
+        table_id: Id of the table sent in every message.
+        use_pickle: Publish pickled card lists for old subscribers.
+        fps: Camera frames checked per second.
+        keyframe_interval: Seconds between full table keyframes.
     """
     context = zmq.Context()
     socket = context.socket(zmq.PUB)
     socket.bind(f"tcp://*:{port}")
+    publisher = wire.HandsPublisher(socket, table_id, keyframe_interval, use_pickle)
 
-    deck = [cards.Card(*args) for args in itertools.product(cards.Rank, cards.Suit)]
+    deck = range(encoding.NUM_CARDS)
+    hands = [random.choices(deck, k=2) for _ in range(num_players)]
 
+    seq = 0
     while True:
-        hands = [
-            random.choices(deck, k=2) for _ in range(num_players)
-        ]  # TODO: get list of hands from CV predictor
-        socket.send_pyobj(hands)
+        if random.random() < 1 / fps:  # deal new hands about once a second
+            hands = [random.choices(deck, k=2) for _ in range(num_players)]
+        publisher.publish(seq, time.time_ns(), hands)
+        seq += 1
+        time.sleep(1 / fps)
@@ -0,0 +1,265 @@
+"""Frame sources for the vision pipeline.
+
+A source hands out BGR frames one at a time from a live camera, a video file
+or a directory of images, so the pipeline can be run and measured on a
+machine without a camera. A live camera can be drained on its own thread so
+readers always get the newest frame rather than one queued in the driver.
+"""
+
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from pathlib import Path
+from types import TracebackType
+
+import cv2
+import numpy as np
+import numpy.typing as npt
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SUFFIXES = frozenset((".jpg", ".jpeg", ".png", ".bmp"))
+# test split of the card dataset, as laid out in data-config.yaml
+TEST_IMAGES = Path("data") / "test" / "images"
+MAX_FAILURES = 30  # failed camera reads in a row before giving up
+
+
+class FrameSource(ABC):
+    """Base of all frame sources."""
+
+    live = False  # whether frames arrive in real time and may be skipped
+    dropped = 0  # frames the source skipped because nobody read them in time
+
+    @abstractmethod
+    def read(self) -> npt.NDArray[np.uint8] | None:
+        """Next frame, None once the source is exhausted."""
+
+    def read_stamped(self) -> tuple[int, npt.NDArray[np.uint8]] | None:
+        """Next frame with its capture time in ns, None once exhausted."""
+        frame = self.read()
+        return None if frame is None else (time.time_ns(), frame)
+
+    def close(self) -> None:
+        """Releases the source."""
+
+    def __iter__(self) -> Iterator[npt.NDArray[np.uint8]]:
+        while (frame := self.read()) is not None:
+            yield frame
+
+    def __enter__(self) -> "FrameSource":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+class CaptureSource(FrameSource):
+    """Camera or video file read through `cv2.VideoCapture`."""
+
+    def __init__(self, target: int | Path, loop: bool = False) -> None:
+        """Opens the capture.
+
+        Args:
+            target: Camera index or video file path.
+            loop: Start a video file over when it ends.
+
+        Raises:
+            OSError: If the capture cannot be opened.
+        """
+        self.target = target
+        self.live = isinstance(target, int)
+        self.loop = loop and not self.live
+        self.capture = cv2.VideoCapture(
+            target if isinstance(target, int) else str(target)
+        )
+        if not self.capture.isOpened():
+            raise OSError(f"Could not open {target}")
+        if self.live:  # keep as few stale frames queued in the driver as it allows
+            self.capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+    def read(
+        self, out: npt.NDArray[np.uint8] | None = None
+    ) -> npt.NDArray[np.uint8] | None:
+        """Next frame, decoded into `out` when it has the frame's shape."""
+        failures = 0
+        while True:
+            ok, frame = self.capture.read(out)
+            if ok:
+                return np.asarray(frame)
+            if self.live:
+                logger.warning("Camera %s returned no frame", self.target)
+                failures += 1
+                if failures == MAX_FAILURES:
+                    return None
+                continue
+            if not self.loop:
+                return None
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def close(self) -> None:
+        self.capture.release()
+
+
+class LatestFrameSource(FrameSource):
+    """Live capture drained on its own thread, keeping only the newest frame.
+
+    Frames go into three preallocated buffers: one being captured into, one
+    holding the newest complete frame and one owned by the reader, so the
+    capture thread never waits for the reader nor writes into its frame.
+    """
+
+    live = True
+
+    def __init__(self, source: CaptureSource) -> None:
+        """Starts draining a capture.
+
+        Args:
+            source: Live camera; closed along with this source.
+        """
+        self.source = source
+        self.buffers: list[npt.NDArray[np.uint8]] = []
+        self.timestamps = [0, 0, 0]
+        self.writing, self.ready, self.reading = 0, 1, 2
+        self.fresh = False  # whether `ready` holds a frame not read yet
+        self.ended = False
+        self.captured = 0
+        self.dropped = 0  # frames replaced before they were read
+        self.condition = threading.Condition()
+        self.running = True
+        self.thread = threading.Thread(target=self._drain, name="capture", daemon=True)
+        self.thread.start()
+
+    def _drain(self) -> None:
+        while self.running:
+            out = self.buffers[self.writing] if self.buffers else None
+            frame = self.source.read(out)
+            timestamp_ns = time.time_ns()
+            if frame is None:
+                break
+            if not self.buffers:  # allocate once the frame shape is known
+                self.buffers = [frame, np.empty_like(frame), np.empty_like(frame)]
+            elif frame is not out:  # the camera changed resolution
+                self.buffers[self.writing] = frame
+            self.timestamps[self.writing] = timestamp_ns
+            with self.condition:
+                self.writing, self.ready = self.ready, self.writing
+                self.captured += 1
+                if self.fresh:
+                    self.dropped += 1
+                self.fresh = True
+                self.condition.notify()
+        with self.condition:
+            self.ended = True
+            self.condition.notify_all()
+
+    def read_stamped(
+        self, timeout: float | None = None, copy: bool = True
+    ) -> tuple[int, npt.NDArray[np.uint8]] | None:
+        """Newest frame not read yet, waiting only if there is none.
+
+        Args:
+            timeout: Longest wait in seconds, None to wait until a frame comes.
+            copy: Return a copy. Without it the frame is only valid until the
+                next read.
+
+        Returns:
+            tuple | None: Capture time in ns and frame, None if the camera
+            stopped or the wait timed out.
+        """
+        with self.condition:
+            if (
+                not self.condition.wait_for(lambda: self.fresh or self.ended, timeout)
+                or not self.fresh
+            ):
+                return None
+            self.reading, self.ready = self.ready, self.reading
+            self.fresh = False
+        frame = self.buffers[self.reading]
+        return self.timestamps[self.reading], frame.copy() if copy else frame
+
+    def read(self) -> npt.NDArray[np.uint8] | None:
+        stamped = self.read_stamped()
+        return None if stamped is None else stamped[1]
+
+    def close(self) -> None:
+        self.running = False
+        self.thread.join(timeout=1.0)
+        self.source.close()
+
+
+class ImageDirSource(FrameSource):
+    """Images of a directory in name order, like a dataset split."""
+
+    def __init__(self, path: Path, loop: bool = False, preload: bool = False):
+        """Lists the images.
+
+        Args:
+            path: Directory of images.
+            loop: Start over after the last image.
+            preload: Decode every image up front, so reading costs no disk or
+                decoding time, as when measuring the pipeline.
+
+        Raises:
+            FileNotFoundError: If the directory holds no images.
+        """
+        self.paths = sorted(
+            p for p in path.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES
+        )
+        if not self.paths:
+            raise FileNotFoundError(f"No images in {path}")
+        self.loop = loop
+        self.index = 0
+        self.images = [self._load(p) for p in self.paths] if preload else None
+
+    @staticmethod
+    def _load(path: Path) -> npt.NDArray[np.uint8]:
+        image = cv2.imread(str(path))
+        if image is None:
+            raise OSError(f"Could not read {path}")
+        return np.asarray(image)
+
+    def read(self) -> npt.NDArray[np.uint8] | None:
+        if self.index == len(self.paths):
+            if not self.loop:
+                return None
+            self.index = 0
+        i = self.index
+        self.index += 1
+        return self.images[i] if self.images is not None else self._load(self.paths[i])
+
+
+def open_source(
+    target: int | str | Path,
+    loop: bool = False,
+    preload: bool = False,
+    latest: bool = False,
+) -> FrameSource:
+    """Opens a camera index, video file or image directory.
+
+    Args:
+        target: Camera index, or path of a video file or image directory.
+            Strings of digits are taken as camera indices.
+        loop: Start files over when they end.
+        preload: Decode a directory's images up front.
+        latest: Drain a camera on its own thread and read only its newest
+            frames.
+
+    Returns:
+        FrameSource: Ready to read.
+    """
+    if isinstance(target, str) and target.isdigit():
+        target = int(target)
+    if isinstance(target, int):
+        camera = CaptureSource(target)
+        return LatestFrameSource(camera) if latest else camera
+    path = Path(target)
+    if path.is_dir():
+        return ImageDirSource(path, loop, preload)
+    return CaptureSource(path, loop)
@@ -0,0 +1,215 @@
+"""Per-stage latency histograms of the vision pipeline.
+
+Every stage is timed with the monotonic `perf_counter_ns` clock into a
+histogram of fixed log spaced bins, so recording a sample costs a bisect and
+an increment and never allocates a buffer. Percentiles are read from the bins
+on demand, for a periodic log line or a stats request over zmq.
+"""
+
+import bisect
+import json
+import logging
+import threading
+import time
+from types import TracebackType
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+import zmq
+
+logger = logging.getLogger(__name__)
+
+BINS_PER_DECADE = 20  # about 12% between bin edges
+MIN_NS = 1_000  # 1 us, faster samples land in the first bin
+MAX_NS = 100_000_000_000  # 100 s, slower samples land in the last bin
+PERCENTILES = (50, 95, 99)
+
+
+class LatencyHistogram:
+    """Counts of durations in fixed log spaced bins."""
+
+    def __init__(self) -> None:
+        decades = np.log10(MAX_NS / MIN_NS)
+        edges = np.geomspace(MIN_NS, MAX_NS, int(decades * BINS_PER_DECADE) + 1)
+        self._edges: list[float] = edges.tolist()
+        # geometric middle of every bin, with the outer edges for the overflow bins
+        self._values = np.concatenate(
+            ([MIN_NS], np.sqrt(edges[:-1] * edges[1:]), [MAX_NS])
+        )
+        self.counts: npt.NDArray[np.int64] = np.zeros(len(edges) + 1, dtype=np.int64)
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, duration_ns: int) -> None:
+        """Adds one duration."""
+        self.counts[bisect.bisect_right(self._edges, duration_ns)] += 1
+        self.total_ns += duration_ns
+        if duration_ns > self.max_ns:
+            self.max_ns = duration_ns
+
+    @property
+    def count(self) -> int:
+        """Number of durations recorded."""
+        return int(self.counts.sum())
+
+    def percentile(self, q: float) -> float:
+        """Duration in ms below which `q` percent of the samples fall."""
+        cumulative = self.counts.cumsum()
+        if not cumulative[-1]:
+            return float("nan")
+        index = int(np.searchsorted(cumulative, q / 100 * cumulative[-1]))
+        return float(self._values[index]) / 1e6
+
+    def summary(self) -> dict[str, float]:
+        """Count, mean, max and percentiles in ms."""
+        count = self.count
+        summary = {
+            "count": count,
+            "mean": self.total_ns / count / 1e6 if count else float("nan"),
+            "max": self.max_ns / 1e6,
+        }
+        summary.update({f"p{q}": self.percentile(q) for q in PERCENTILES})
+        return summary
+
+    def reset(self) -> None:
+        """Forgets every duration."""
+        self.counts[:] = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+
+class Timer:
+    """Reusable context manager timing a block into a histogram."""
+
+    def __init__(self, histogram: LatencyHistogram) -> None:
+        self.histogram = histogram
+        self.start_ns = 0
+
+    def __enter__(self) -> "Timer":
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.histogram.record(time.perf_counter_ns() - self.start_ns)
+
+
+class StageTimings:
+    """Latency histograms of named pipeline stages.
+
+    Each stage should be timed from one thread only; readers see counts that
+    may be a sample behind.
+    """
+
+    def __init__(self) -> None:
+        self.histograms: dict[str, LatencyHistogram] = {}
+        self._timers: dict[str, Timer] = {}
+
+    def histogram(self, stage: str) -> LatencyHistogram:
+        """Histogram of a stage, created on first use."""
+        if stage not in self.histograms:
+            self.histograms[stage] = LatencyHistogram()
+            self._timers[stage] = Timer(self.histograms[stage])
+        return self.histograms[stage]
+
+    def timer(self, stage: str) -> Timer:
+        """Context manager timing a block of a stage."""
+        timer = self._timers.get(stage)
+        if timer is None:
+            self.histogram(stage)
+            timer = self._timers[stage]
+        return timer
+
+    def record(self, stage: str, duration_ns: int) -> None:
+        """Adds a duration measured elsewhere, like a capture to publish delay."""
+        self.histogram(stage).record(duration_ns)
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        """Summary of every stage, as sent over the stats socket."""
+        return {
+            stage: histogram.summary()
+            for stage, histogram in list(self.histograms.items())
+        }
+
+    def log_line(self) -> str:
+        """p50/p95/p99 of every stage in ms on one line."""
+        return "  ".join(
+            f"{stage} " + "/".join(f"{summary[f'p{q}']:.1f}" for q in PERCENTILES)
+            for stage, summary in self.snapshot().items()
+        )
+
+    def reset(self) -> None:
+        """Forgets every stage's durations."""
+        for histogram in list(self.histograms.values()):
+            histogram.reset()
+
+
+class StatsServer(threading.Thread):
+    """Answers stats requests for a pipeline's timings on a REP socket.
+
+    Any JSON request is answered with the snapshot of every stage; a request
+    of `{"command": "reset"}` also clears the histograms. Anything else gets an
+    error reply.
+    """
+
+    def __init__(self, timings: StageTimings, port: int) -> None:
+        super().__init__(name="stats", daemon=True)
+        self.timings = timings
+        self.port = port
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        socket = zmq.Context().socket(zmq.REP)
+        socket.bind(f"tcp://*:{self.port}")
+        try:
+            while not self.stopped.is_set():
+                if not socket.poll(100):
+                    continue
+                message = socket.recv()
+                try:
+                    request = json.loads(message)
+                except ValueError as e:
+                    socket.send_json(
+                        {"ok": False, "error": f"Malformed request {message!r}: {e}"}
+                    )
+                    continue
+                socket.send_json({"ok": True, "stages": self.timings.snapshot()})
+                if isinstance(request, dict) and request.get("command") == "reset":
+                    self.timings.reset()
+        except zmq.ZMQError:
+            logger.exception("Stats socket failed")
+        finally:
+            socket.close()
+
+    def stop(self) -> None:
+        """Makes the thread return within a poll interval."""
+        self.stopped.set()
+
+
+def request_stats(
+    port: int, host: str = "localhost", reset: bool = False, timeout: float = 1.0
+) -> dict[str, dict[str, float]]:
+    """Asks a pipeline's stats socket for its stage timings.
+
+    Raises:
+        TimeoutError: If no reply comes in time.
+        RuntimeError: If the stats socket refuses the request.
+    """
+    socket = zmq.Context().socket(zmq.REQ)
+    socket.setsockopt(zmq.LINGER, 0)
+    socket.connect(f"tcp://{host}:{port}")
+    try:
+        socket.send_json({"command": "reset" if reset else "stats"})
+        if not socket.poll(int(timeout * 1000)):
+            raise TimeoutError(f"No stats from port {port}")
+        reply: dict[str, Any] = socket.recv_json()  # type: ignore[assignment]
+        if not reply.get("ok"):
+            raise RuntimeError(reply.get("error", "Stats request refused"))
+        return reply["stages"]
+    finally:
+        socket.close()
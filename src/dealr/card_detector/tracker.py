@@ -0,0 +1,184 @@
+"""Per-seat card tracking with hysteresis.
+
+Detections are associated with existing tracks by distance, so a card keeps
+its track while it sits still even if its label or confidence flickers. A
+track only becomes part of the hand once `confirm_after` observations in a
+row agree on its label, and only leaves it after `drop_after` detection passes
+without a matching box. A confirmed card changes label the same way, so a
+flickering label never replaces it.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+
+from dealr.blackjack import encoding
+
+MAX_DISTANCE = 40.0  # pixels a card center may move between detection passes
+
+
+@dataclass
+class Track:
+    """One card seen across frames."""
+
+    center: npt.NDArray[np.float32]
+    label: int  # card id of the latest observation
+    streak: int = 0  # observations in a row with that label
+    misses: int = 0
+    card_id: int = encoding.NO_CARD  # confirmed label, NO_CARD until confirmed
+
+    @property
+    def confirmed(self) -> bool:
+        """Whether a label has been seen often enough in a row."""
+        return self.card_id != encoding.NO_CARD
+
+
+class SeatTracker:
+    """Tracks the cards in one seat region."""
+
+    def __init__(
+        self,
+        confirm_after: int = 3,
+        drop_after: int = 5,
+        max_distance: float = MAX_DISTANCE,
+    ) -> None:
+        """Sets up an empty seat.
+
+        Args:
+            confirm_after: Observations in a row agreeing on a label before a
+                card joins the hand or changes label.
+            drop_after: Consecutive misses before a card leaves the hand.
+            max_distance: Largest center movement still matched to a track.
+        """
+        self.confirm_after = confirm_after
+        self.drop_after = drop_after
+        self.max_distance = max_distance
+        self.tracks: list[Track] = []  # in order of first sighting
+
+    def update(
+        self, card_ids: npt.NDArray[np.uint8], centers: npt.NDArray[np.float32]
+    ) -> None:
+        """Associates one detection pass with the tracks.
+
+        Args:
+            card_ids: Ids of the cards detected in the seat.
+            centers: `(cards, 2)` centers of those cards.
+        """
+        valid = card_ids != encoding.NO_CARD
+        card_ids, centers = card_ids[valid], centers[valid]
+        matched = np.zeros(len(card_ids), dtype=bool)
+        seen = np.zeros(len(self.tracks), dtype=bool)
+
+        if self.tracks and len(card_ids):
+            track_centers = np.stack([track.center for track in self.tracks])
+            distances = np.linalg.norm(
+                track_centers[:, np.newaxis] - centers[np.newaxis], axis=2
+            )
+            # greedy matching, closest pairs first
+            for flat in np.argsort(distances, axis=None):
+                t, d = np.unravel_index(flat, distances.shape)
+                if distances[t, d] > self.max_distance:
+                    break
+                if seen[t] or matched[d]:
+                    continue
+                self._hit(self.tracks[t], int(card_ids[d]), centers[d])
+                seen[t] = matched[d] = True
+
+        for track, hit in zip(self.tracks, seen):
+            track.misses = 0 if hit else track.misses + 1
+        self.tracks = [track for track in self.tracks if track.misses < self.drop_after]
+
+        for card_id, center in zip(card_ids[~matched], centers[~matched]):
+            track = Track(center.astype(np.float32), int(card_id))
+            self._hit(track, int(card_id), center)
+            self.tracks.append(track)
+
+    def _hit(self, track: Track, card_id: int, center: npt.NDArray[np.float32]) -> None:
+        track.center = center.astype(np.float32)
+        if card_id == track.label:
+            track.streak += 1
+        else:
+            track.label, track.streak = card_id, 1
+        if track.streak >= self.confirm_after:
+            track.card_id = card_id
+
+    def hand(self) -> npt.NDArray[np.uint8]:
+        """Ids of the confirmed cards in order of first sighting."""
+        return np.array(
+            [track.card_id for track in self.tracks if track.confirmed],
+            dtype=np.uint8,
+        )
+
+    def clear(self) -> None:
+        """Forgets every card."""
+        self.tracks.clear()
+
+
+class TableTracker:
+    """Seat trackers for every region of a table."""
+
+    def __init__(
+        self,
+        num_regions: int,
+        confirm_after: int = 3,
+        drop_after: int = 5,
+        max_distance: float = MAX_DISTANCE,
+    ) -> None:
+        """Sets up one tracker per region.
+
+        Args:
+            num_regions: Number of seat regions.
+            confirm_after: Observations in a row agreeing on a label before a
+                card joins a hand or changes label.
+            drop_after: Consecutive misses before a card leaves a hand.
+            max_distance: Largest center movement still matched to a track.
+        """
+        self.seats = [
+            SeatTracker(confirm_after, drop_after, max_distance)
+            for _ in range(num_regions)
+        ]
+
+    def update(
+        self,
+        card_ids: npt.NDArray[np.uint8],
+        centers: npt.NDArray[np.float32],
+        mask: npt.NDArray[np.bool_],
+        seats: npt.NDArray[np.bool_] | None = None,
+    ) -> None:
+        """Feeds one detection pass to the seats it examined.
+
+        Args:
+            card_ids: Ids of every detected card.
+            centers: `(cards, 2)` centers of those cards.
+            mask: `(regions, cards)` region membership from
+                `layout.points_in_polygons`.
+            seats: Seats the pass examined, None for all of them. The others
+                keep their tracks as they are.
+        """
+        for i, (seat, row) in enumerate(zip(self.seats, mask)):
+            if seats is None or seats[i]:
+                seat.update(card_ids[row], centers[row])
+
+    def hands(self) -> list[npt.NDArray[np.uint8]]:
+        """Confirmed card ids of every seat."""
+        return [seat.hand() for seat in self.seats]
+
+
+class DetectionScheduler:
+    """Decides which frames get a full detection pass."""
+
+    def __init__(self, every: int = 1) -> None:
+        """Sets up the schedule.
+
+        Args:
+            every: Run detection on every `every`-th frame handed to it.
+        """
+        self.every = max(1, every)
+        self.frames = 0
+
+    def should_detect(self) -> bool:
+        """Whether the next frame gets a detection pass."""
+        detect = self.frames % self.every == 0
+        self.frames += 1
+        return detect
@@ -1,5 +1,6 @@
 import multiprocessing as mp
 import time
+from multiprocessing.synchronize import Event
 from pathlib import Path
 
 import cv2
@@ -7,8 +8,13 @@ import numpy as np
 import pupil_apriltags as apriltag
 from ultralytics import YOLO
 
+from dealr.card_detector.frame_ring import FrameRing, FrameRingSpec
 
-def detect_apriltags(frame_queue: mp.Queue, tag_queue: mp.Queue) -> None:
+
+def detect_apriltags(
+    ring_spec: FrameRingSpec, tag_queue: mp.Queue, stop: Event
+) -> None:
+    ring = FrameRing.attach(ring_spec)
     detector = apriltag.Detector(
         families="tag25h9",
         nthreads=4,
@@ -18,12 +24,17 @@ def detect_apriltags(frame_queue: mp.Queue, tag_queue: mp.Queue) -> None:
         decode_sharpening=0.25,
     )
 
-    while True:
-        frame = frame_queue.get()
-        if frame is None:
-            break
+    seq = -1
+    while not stop.is_set():
+        latest = ring.wait_latest(seq, timeout=0.1)
+        if latest is None:
+            continue
+        seq, frame = latest
 
+        # read the frame in place, then make sure it was not overwritten
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if not ring.valid(seq):
+            continue
         detections = detector.detect(gray)
 
         tag_data = {}
@@ -33,6 +44,8 @@ def detect_apriltags(frame_queue: mp.Queue, tag_queue: mp.Queue) -> None:
 
         tag_queue.put(tag_data)
 
+    ring.close()
+
 
 def draw_rectangle_with_label(frame, tag_data, id1, id2, card_labels) -> None:
     if id1 in tag_data and id2 in tag_data:
@@ -65,133 +78,145 @@ def main():
         print("Error: Could not open camera.")
         return
 
-    frame_queue = mp.Queue(maxsize=2)
-    tag_queue = mp.Queue()
-
-    tag_process = mp.Process(target=detect_apriltags, args=(frame_queue, tag_queue))
-    tag_process.start()
-
-    current_tags = {}
-    prev_time = time.time()
-    fps = 0
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        if not frame_queue.full():
-            frame_queue.put(frame.copy())
-
-        results = model.predict(source=frame, verbose=False)
-        annotated_frame = frame.copy()
+    ret, frame = cap.read()
+    if not ret:
+        print("Error: Could not read from camera.")
+        return
 
-        detected_cards = []
-        for r in results[0].boxes:
-            conf = float(r.conf[0])
-            if conf >= 0.5:
-                xyxy = r.xyxy[0].cpu().numpy().astype(int)
-                cls = int(r.cls[0])
-                label = results[0].names[cls]
-                detected_cards.append((label, xyxy))
+    with FrameRing.create(frame.shape) as ring:
+        tag_queue = mp.Queue()
+        stop = mp.Event()
 
-                cv2.rectangle(annotated_frame, xyxy[:2], xyxy[2:], (255, 0, 0), 2)
+        tag_process = mp.Process(
+            target=detect_apriltags, args=(ring.spec, tag_queue, stop)
+        )
+        tag_process.start()
+        seq = 0
+
+        current_tags = {}
+        prev_time = time.time()
+        fps = 0
+
+        try:
+            # the frame read for the ring's shape is published first
+            while True:
+                ring.write(seq, time.time_ns(), frame)
+                seq += 1
+
+                results = model.predict(source=frame, verbose=False)
+                annotated_frame = frame.copy()
+
+                detected_cards = []
+                for r in results[0].boxes:
+                    conf = float(r.conf[0])
+                    if conf >= 0.5:
+                        xyxy = r.xyxy[0].cpu().numpy().astype(int)
+                        cls = int(r.cls[0])
+                        label = results[0].names[cls]
+                        detected_cards.append((label, xyxy))
+
+                        cv2.rectangle(
+                            annotated_frame, xyxy[:2], xyxy[2:], (255, 0, 0), 2
+                        )
+                        cv2.putText(
+                            annotated_frame,
+                            f"{label} {conf:.2f}",
+                            (xyxy[0], xyxy[1] - 5),
+                            cv2.FONT_HERSHEY_SIMPLEX,
+                            0.5,
+                            (255, 0, 0),
+                            1,
+                        )
+
+                # Update FPS
+                end = time.time()
+                fps = 1.0 / (end - prev_time)
+                prev_time = end
+
+                # Update tag data
+                while not tag_queue.empty():
+                    current_tags = tag_queue.get()
+
+                # Determine which cards are inside each rectangle
+                cards_rect1, cards_rect2 = [], []
+                if current_tags:
+                    if 21 in current_tags and 22 in current_tags:
+                        rect1_xmin = min(
+                            current_tags[21][:, 0].min(), current_tags[22][:, 0].min()
+                        )
+                        rect1_xmax = max(
+                            current_tags[21][:, 0].max(), current_tags[22][:, 0].max()
+                        )
+                        rect1_ymin = min(
+                            current_tags[21][:, 1].min(), current_tags[22][:, 1].min()
+                        )
+                        rect1_ymax = max(
+                            current_tags[21][:, 1].max(), current_tags[22][:, 1].max()
+                        )
+
+                        for label, xyxy in detected_cards:
+                            cx, cy = (xyxy[0] + xyxy[2]) // 2, (xyxy[1] + xyxy[3]) // 2
+                            if (
+                                rect1_xmin <= cx <= rect1_xmax
+                                and rect1_ymin <= cy <= rect1_ymax
+                            ):
+                                cards_rect1.append(label)
+
+                    if 23 in current_tags and 24 in current_tags:
+                        rect2_xmin = min(
+                            current_tags[23][:, 0].min(), current_tags[24][:, 0].min()
+                        )
+                        rect2_xmax = max(
+                            current_tags[23][:, 0].max(), current_tags[24][:, 0].max()
+                        )
+                        rect2_ymin = min(
+                            current_tags[23][:, 1].min(), current_tags[24][:, 1].min()
+                        )
+                        rect2_ymax = max(
+                            current_tags[23][:, 1].max(), current_tags[24][:, 1].max()
+                        )
+
+                        for label, xyxy in detected_cards:
+                            cx, cy = (xyxy[0] + xyxy[2]) // 2, (xyxy[1] + xyxy[3]) // 2
+                            if (
+                                rect2_xmin <= cx <= rect2_xmax
+                                and rect2_ymin <= cy <= rect2_ymax
+                            ):
+                                cards_rect2.append(label)
+
+                    draw_rectangle_with_label(
+                        annotated_frame, current_tags, 21, 22, cards_rect1
+                    )
+                    draw_rectangle_with_label(
+                        annotated_frame, current_tags, 23, 24, cards_rect2
+                    )
+
+                # Show FPS at top-right
+                h, w = annotated_frame.shape[:2]
                 cv2.putText(
                     annotated_frame,
-                    f"{label} {conf:.2f}",
-                    (xyxy[0], xyxy[1] - 5),
+                    f"FPS: {fps:.1f}",
+                    (w - 150, 30),
                     cv2.FONT_HERSHEY_SIMPLEX,
-                    0.5,
-                    (255, 0, 0),
-                    1,
-                )
-
-        # Update FPS
-        end = time.time()
-        fps = 1.0 / (end - prev_time)
-        prev_time = end
-
-        # Update tag data
-        while not tag_queue.empty():
-            current_tags = tag_queue.get()
-
-        # Determine which cards are inside each rectangle
-        cards_rect1, cards_rect2 = [], []
-        if current_tags:
-            if 21 in current_tags and 22 in current_tags:
-                rect1_xmin = min(
-                    current_tags[21][:, 0].min(), current_tags[22][:, 0].min()
-                )
-                rect1_xmax = max(
-                    current_tags[21][:, 0].max(), current_tags[22][:, 0].max()
-                )
-                rect1_ymin = min(
-                    current_tags[21][:, 1].min(), current_tags[22][:, 1].min()
+                    0.8,
+                    (0, 0, 255),
+                    2,
+                    cv2.LINE_AA,
                 )
-                rect1_ymax = max(
-                    current_tags[21][:, 1].max(), current_tags[22][:, 1].max()
-                )
-
-                for label, xyxy in detected_cards:
-                    cx, cy = (xyxy[0] + xyxy[2]) // 2, (xyxy[1] + xyxy[3]) // 2
-                    if (
-                        rect1_xmin <= cx <= rect1_xmax
-                        and rect1_ymin <= cy <= rect1_ymax
-                    ):
-                        cards_rect1.append(label)
-
-            if 23 in current_tags and 24 in current_tags:
-                rect2_xmin = min(
-                    current_tags[23][:, 0].min(), current_tags[24][:, 0].min()
-                )
-                rect2_xmax = max(
-                    current_tags[23][:, 0].max(), current_tags[24][:, 0].max()
-                )
-                rect2_ymin = min(
-                    current_tags[23][:, 1].min(), current_tags[24][:, 1].min()
-                )
-                rect2_ymax = max(
-                    current_tags[23][:, 1].max(), current_tags[24][:, 1].max()
-                )
-
-                for label, xyxy in detected_cards:
-                    cx, cy = (xyxy[0] + xyxy[2]) // 2, (xyxy[1] + xyxy[3]) // 2
-                    if (
-                        rect2_xmin <= cx <= rect2_xmax
-                        and rect2_ymin <= cy <= rect2_ymax
-                    ):
-                        cards_rect2.append(label)
-
-            draw_rectangle_with_label(
-                annotated_frame, current_tags, 21, 22, cards_rect1
-            )
-            draw_rectangle_with_label(
-                annotated_frame, current_tags, 23, 24, cards_rect2
-            )
-
-        # Show FPS at top-right
-        h, w = annotated_frame.shape[:2]
-        cv2.putText(
-            annotated_frame,
-            f"FPS: {fps:.1f}",
-            (w - 150, 30),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.8,
-            (0, 0, 255),
-            2,
-            cv2.LINE_AA,
-        )
-
-        cv2.imshow("Live Card Detection", annotated_frame)
 
-        if cv2.waitKey(1) & 0xFF == ord("q"):
-            break
+                cv2.imshow("Live Card Detection", annotated_frame)
 
-    frame_queue.put(None)
-    tag_process.join()
+                if cv2.waitKey(1) & 0xFF == ord("q"):
+                    break
 
-    cap.release()
-    cv2.destroyAllWindows()
+                ret, frame = cap.read()
+                if not ret:
+                    break
+        finally:
+            stop.set()
+            tag_process.join()
+            cap.release()
+            cv2.destroyAllWindows()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,347 @@
+"""Versioned binary wire format for card detector hands.
+
+A message is three zmq frames:
+
+1. a fixed little-endian header with the format version, message kind, table
+   id, frame sequence number, sequence of the previous message, capture
+   timestamp and seat count,
+2. `uint16` offsets of every seat's cards, one more than the number of seats,
+3. the packed `uint8` card ids of every seat back to back.
+
+Deltas carry only the seats that changed, listed in a fourth `uint8` frame.
+Receivers read the payload frames straight into NumPy without copying. The
+old pickled list of card lists is still understood when explicitly allowed,
+for rolling the format out one service at a time.
+"""
+
+import pickle
+import struct
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass
+from enum import IntEnum
+
+import numpy as np
+import numpy.typing as npt
+import zmq
+
+from dealr.blackjack import cards, encoding
+
+VERSION = 2
+
+# version, kind, table id, frame sequence, previous sequence, capture
+# timestamp ns, seats
+HEADER = struct.Struct("<BBHQQQH")
+
+
+class MessageKind(IntEnum):
+    """What a message's seat hands describe."""
+
+    HANDS = 0  # every seat, sent for every frame
+    KEYFRAME = 1  # every seat, sent periodically by change-only publishers
+    DELTA = 2  # only the seats that changed since the previous message
+
+
+@dataclass
+class HandsMessage:
+    """Hands of every seat at a table for one camera frame."""
+
+    table_id: int
+    seq: int
+    timestamp_ns: int
+    offsets: npt.NDArray[np.uint16]
+    ids: npt.NDArray[np.uint8]
+    kind: MessageKind = MessageKind.HANDS
+    prev_seq: int = 0
+    seats: npt.NDArray[np.uint8] | None = None  # changed seats of a delta
+
+    @property
+    def num_seats(self) -> int:
+        """Number of hands in the message."""
+        return len(self.offsets) - 1
+
+    def seat(self, index: int) -> npt.NDArray[np.uint8]:
+        """View of the card ids of the message's `index`-th hand."""
+        return self.ids[self.offsets[index] : self.offsets[index + 1]]
+
+    def hands(self) -> list[npt.NDArray[np.uint8]]:
+        """Views of every hand's card ids."""
+        return [self.seat(index) for index in range(self.num_seats)]
+
+    def cards(self) -> list[list[cards.Card]]:
+        """Every seat's hand decoded into card objects."""
+        return [encoding.to_cards(hand.tolist()) for hand in self.hands()]
+
+
+def pack_hands(
+    hands: Sequence[npt.ArrayLike],
+) -> tuple[npt.NDArray[np.uint16], npt.NDArray[np.uint8]]:
+    """Packs per-seat card ids into seat offsets and one id array.
+
+    Args:
+        hands: Card ids of every seat.
+
+    Returns:
+        tuple: Seat offsets and the concatenated card ids.
+    """
+    seat_ids = [np.asarray(hand, dtype=np.uint8).ravel() for hand in hands]
+    offsets = np.zeros(len(seat_ids) + 1, dtype=np.uint16)
+    np.cumsum([len(ids) for ids in seat_ids], out=offsets[1:])
+    ids = np.concatenate(seat_ids) if seat_ids else np.empty(0, dtype=np.uint8)
+    return offsets, ids
+
+
+def encode_hands(
+    table_id: int,
+    seq: int,
+    timestamp_ns: int,
+    hands: Sequence[npt.ArrayLike],
+    kind: MessageKind = MessageKind.HANDS,
+    prev_seq: int = 0,
+    seats: Sequence[int] | None = None,
+) -> list[bytes | npt.NDArray[np.generic]]:
+    """Builds the frames of a hands message.
+
+    Args:
+        table_id: Id of the table the camera watches.
+        seq: Sequence number of the camera frame.
+        timestamp_ns: Capture time of the camera frame in ns.
+        hands: Card ids of every seat, or of the changed seats of a delta.
+        kind: What the hands describe.
+        prev_seq: Sequence number of the publisher's previous message.
+        seats: Seat of every hand in a delta.
+
+    Returns:
+        list: Header bytes followed by the offset, id and seat arrays.
+    """
+    offsets, ids = pack_hands(hands)
+    header = HEADER.pack(
+        VERSION, kind, table_id, seq, prev_seq, timestamp_ns, len(hands)
+    )
+    frames: list[bytes | npt.NDArray[np.generic]] = [header, offsets, ids]
+    if kind == MessageKind.DELTA:
+        if seats is None or len(seats) != len(hands):
+            raise ValueError("A delta needs the seat of every hand")
+        frames.append(np.asarray(seats, dtype=np.uint8))
+    return frames
+
+
+def decode_hands(frames: Sequence[memoryview | bytes]) -> HandsMessage:
+    """Parses the frames of a hands message without copying the payload.
+
+    Raises:
+        ValueError: If the message is malformed or of another version.
+    """
+    if not frames or len(frames[0]) != HEADER.size:
+        raise ValueError(f"Expected a {HEADER.size} byte header")
+    version, kind, table_id, seq, prev_seq, timestamp_ns, num_seats = HEADER.unpack(
+        frames[0]
+    )
+    if version != VERSION:
+        raise ValueError(f"Unsupported wire format version {version}")
+    kind = MessageKind(kind)
+    expected = 4 if kind == MessageKind.DELTA else 3
+    if len(frames) != expected:
+        raise ValueError(f"Expected {expected} frames, got {len(frames)}")
+    if len(frames[1]) % np.dtype(np.uint16).itemsize:
+        raise ValueError("Seat offsets are not whole uint16 values")
+    offsets = np.frombuffer(frames[1], dtype=np.uint16)
+    ids = np.frombuffer(frames[2], dtype=np.uint8)
+    if (
+        len(offsets) != num_seats + 1
+        or offsets[0] != 0
+        or offsets[-1] != len(ids)
+        or (np.diff(offsets.astype(np.int32)) < 0).any()
+    ):
+        raise ValueError("Seat offsets do not match the card ids")
+    if (ids >= encoding.NUM_CARDS).any():
+        raise ValueError("Card id out of range")
+    seats = None
+    if kind == MessageKind.DELTA:
+        seats = np.frombuffer(frames[3], dtype=np.uint8)
+        if len(seats) != num_seats or len(np.unique(seats)) != num_seats:
+            raise ValueError("Delta seats do not match the hands")
+    return HandsMessage(
+        table_id, seq, timestamp_ns, offsets, ids, kind, prev_seq, seats
+    )
+
+
+def send_hands(
+    socket: zmq.Socket,
+    table_id: int,
+    seq: int,
+    timestamp_ns: int,
+    hands: Sequence[npt.ArrayLike],
+    use_pickle: bool = False,
+) -> None:
+    """Publishes the hands of every seat.
+
+    Args:
+        socket: Socket to send on.
+        table_id: Id of the table the camera watches.
+        seq: Sequence number of the camera frame.
+        timestamp_ns: Capture time of the camera frame in ns.
+        hands: Card ids of every seat.
+        use_pickle: Send the old pickled list of card lists instead.
+    """
+    if use_pickle:
+        socket.send_pyobj([encoding.to_cards(np.asarray(hand)) for hand in hands])
+        return
+    socket.send_multipart(encode_hands(table_id, seq, timestamp_ns, hands), copy=False)
+
+
+def recv_hands(socket: zmq.Socket, allow_pickle: bool = False) -> HandsMessage:
+    """Receives the hands of every seat.
+
+    Args:
+        socket: Socket to receive on.
+        allow_pickle: Also accept the old pickled format, which has no table
+            id, sequence or timestamp. Only enable for trusted publishers.
+
+    Returns:
+        HandsMessage: Hands viewing the received frames.
+
+    Raises:
+        ValueError: If the message is malformed, or pickled and not allowed.
+        pickle.UnpicklingError: If an allowed pickled message is corrupt.
+    """
+    frames = socket.recv_multipart(copy=False)
+    if len(frames) == 1:
+        if not allow_pickle:
+            raise ValueError("Received a pickled hands message")
+        hands: list[list[cards.Card]] = pickle.loads(frames[0].buffer)
+        offsets, ids = pack_hands([encoding.to_ids(hand) for hand in hands])
+        return HandsMessage(0, 0, 0, offsets, ids)
+    return decode_hands([frame.buffer for frame in frames])
+
+
+class HandsPublisher:
+    """Publishes hands only when a seat changes, plus periodic keyframes.
+
+    An idle table then costs one keyframe per interval instead of a message
+    per camera frame, while late subscribers still sync within an interval.
+    """
+
+    def __init__(
+        self,
+        socket: zmq.Socket,
+        table_id: int = 0,
+        keyframe_interval: float = 1.0,
+        use_pickle: bool = False,
+    ) -> None:
+        """Sets up the publisher.
+
+        Args:
+            socket: PUB socket to send on.
+            table_id: Id of the table sent in every message.
+            keyframe_interval: Seconds between keyframes.
+            use_pickle: Send the old pickled format, on changes and keyframes.
+        """
+        self.socket = socket
+        self.table_id = table_id
+        self.keyframe_interval = keyframe_interval
+        self.use_pickle = use_pickle
+        self.hands: list[npt.NDArray[np.uint8]] = []
+        self.last_seq = 0
+        self.last_keyframe = -float("inf")
+
+    def publish(
+        self, seq: int, timestamp_ns: int, hands: Sequence[npt.ArrayLike]
+    ) -> MessageKind | None:
+        """Sends a keyframe, a delta or nothing for one camera frame.
+
+        Args:
+            seq: Sequence number of the camera frame.
+            timestamp_ns: Capture time of the camera frame in ns.
+            hands: Card ids of every seat.
+
+        Returns:
+            MessageKind | None: Kind of the sent message, None if nothing changed.
+        """
+        new = [np.asarray(hand, dtype=np.uint8).ravel() for hand in hands]
+        now = time.monotonic()
+        if len(new) != len(self.hands) or (
+            now - self.last_keyframe >= self.keyframe_interval
+        ):
+            kind = MessageKind.KEYFRAME
+            seats = list(range(len(new)))
+        else:
+            seats = [
+                seat
+                for seat, (old, hand) in enumerate(zip(self.hands, new))
+                if not np.array_equal(old, hand)
+            ]
+            if not seats:
+                return None
+            kind = MessageKind.DELTA
+
+        if self.use_pickle:
+            send_hands(self.socket, self.table_id, seq, timestamp_ns, new, True)
+        else:
+            frames = encode_hands(
+                self.table_id,
+                seq,
+                timestamp_ns,
+                [new[seat] for seat in seats],
+                kind,
+                self.last_seq,
+                seats,
+            )
+            self.socket.send_multipart(frames, copy=False)
+        if kind == MessageKind.KEYFRAME:
+            self.last_keyframe = now
+        self.hands = new
+        self.last_seq = seq
+        return kind
+
+
+class TableState:
+    """Full table state rebuilt by a subscriber from keyframes and deltas."""
+
+    def __init__(self) -> None:
+        self.hands: list[npt.NDArray[np.uint8]] = []
+        self.seq: int | None = None  # None until the first keyframe
+        self.timestamp_ns = 0
+
+    @property
+    def synced(self) -> bool:
+        """Whether the state reflects the publisher's latest message."""
+        return self.seq is not None
+
+    def apply(self, message: HandsMessage) -> bool:
+        """Updates the state with a received message.
+
+        Deltas are ignored until the next keyframe when one arrives before any
+        keyframe or after a dropped message.
+
+        Returns:
+            bool: Whether any seat's hand changed.
+
+        Raises:
+            ValueError: If a delta names a seat the table does not have. The
+                state then waits for the next keyframe.
+        """
+        if message.kind == MessageKind.DELTA:
+            if self.seq is None or message.prev_seq != self.seq:
+                self.seq = None
+                return False
+            assert message.seats is not None
+            if len(message.seats) and message.seats.max() >= len(self.hands):
+                self.seq = None
+                raise ValueError(f"Delta seat out of range of {len(self.hands)}")
+            for index, seat in enumerate(message.seats.tolist()):
+                self.hands[seat] = message.seat(index).copy()
+            changed = True
+        else:
+            hands = [hand.copy() for hand in message.hands()]
+            changed = len(hands) != len(self.hands) or not all(
+                np.array_equal(old, hand) for old, hand in zip(self.hands, hands)
+            )
+            self.hands = hands
+        self.seq = message.seq
+        self.timestamp_ns = message.timestamp_ns
+        return changed
+
+    def cards(self) -> list[list[cards.Card]]:
+        """Every seat's hand decoded into card objects."""
+        return [encoding.to_cards(hand.tolist()) for hand in self.hands]
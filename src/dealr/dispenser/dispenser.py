@@ -4,24 +4,40 @@ from dealr.dispenser.dispenser_core import Dispenser
 from dealr.dispenser.dispenser_gui import start_gui
 from dealr.motor.dynamixel_controller import DynamixelController
 
+# Dynamixel connection parameters
+PORT = "COM8"
+BAUDRATE = 57600
+PROTOCOL_VERSION = 2.0
 
-def main():
-    # Dynamixel connection parameters
-    port = "COM8"
-    baudrate = 57600
-    protocol_version = 2.0
 
+def make_dispensers(port: str = PORT) -> list[Dispenser]:
+    """Connects to the Dynamixel bus and builds the table's dispensers.
+
+    Args:
+        port: Serial port of the Dynamixel bus.
+
+    Returns:
+        list[Dispenser]: Dispensers for motor IDs 20, 21 and 22, sharing one
+            controller and lock.
+
+    Raises:
+        RuntimeError: If the port cannot be opened.
+    """
     # Create one shared Dynamixel controller
-    motor_controller = DynamixelController(port, baudrate, protocol_version)
+    motor_controller = DynamixelController(port, BAUDRATE, PROTOCOL_VERSION)
     motor_lock = threading.Lock()
 
     # Initialize three dispenser objects for motor IDs 20, 21, 22
-    disp1 = Dispenser(motor_controller, motor_id=20, lock=motor_lock)
-    disp2 = Dispenser(motor_controller, motor_id=21, lock=motor_lock)
-    disp3 = Dispenser(motor_controller, motor_id=22, lock=motor_lock)
+    return [
+        Dispenser(motor_controller, motor_id=20, chip_value=100, lock=motor_lock),
+        Dispenser(motor_controller, motor_id=21, chip_value=50, lock=motor_lock),
+        Dispenser(motor_controller, motor_id=22, chip_value=25, lock=motor_lock),
+    ]
+
 
-    # Start GUI with both dispensers
-    start_gui(disp1, disp2, disp3)
+def main():
+    # Start GUI with all dispensers
+    start_gui(*make_dispensers())
 
 
 if __name__ == "__main__":
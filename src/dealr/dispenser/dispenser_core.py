@@ -52,10 +52,12 @@ class Dispenser:
         self,
         motor_controller: DynamixelController,
         motor_id: int,
+        chip_value: int,
         lock: threading.Lock | None = None,
     ) -> None:
         self.motor_controller = motor_controller
         self.motor_id = motor_id
+        self.chip_value = chip_value  # value of the chips loaded
         self.lock = lock  # shared lock for thread-safe access
         self._chip_count = 0
         self._state = DispenserState.OFF
@@ -1,19 +1,48 @@
 """Server for chip dispenser."""
 
 import time
+from collections.abc import Sequence
 
 import zmq
 
+from dealr.dispenser import settlement
+from dealr.dispenser.dispenser_core import Dispenser
 
-def serve(port: int) -> None:
-    """Spawns a server for the chip dispenser."""
+
+def run_plan(plan: settlement.SettlementPlan, dispensers: Sequence[Dispenser]) -> None:
+    """Pushes a round's chips, one dispenser at a time in seat order."""
+    by_motor = {dispenser.motor_id: dispenser for dispenser in dispensers}
+    for motor_id, moves in plan.moves.items():
+        for move in moves:
+            by_motor[motor_id].dispense(move.chips)
+
+
+def serve(port: int, dispensers: Sequence[Dispenser] = ()) -> None:
+    """Spawns a server for the chip dispenser.
+
+    Args:
+        port: Port to answer payout requests on.
+        dispensers: Dispensers that pay out round settlements. Without any,
+            settlements are acknowledged and skipped.
+    """
 
     context = zmq.Context()
     socket = context.socket(zmq.REP)
     socket.bind(f"tcp://*:{port}")
+    chip_values = {dispenser.motor_id: dispenser.chip_value for dispenser in dispensers}
 
     while True:
         message = socket.recv_string()
+        if settlement.is_settlement(message):
+            round_id, payouts = settlement.decode_settlement(message)
+            if not dispensers:
+                socket.send_string(f"Round {round_id}: settlement skipped")
+                continue
+            plan = settlement.build_plan(round_id, payouts, chip_values)
+            run_plan(plan, dispensers)
+            socket.send_string(plan.summary())
+            continue
+
         player, amount = tuple(int(i) for i in message.split())
 
         time.sleep(0.1)
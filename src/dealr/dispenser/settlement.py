@@ -0,0 +1,124 @@
+"""Round-level payout settlement for the chip dispensers.
+
+The game sends every seat's payout for a round in one message, and the
+dispenser side turns it into a plan that groups chip moves by dispenser, so a
+round costs one round trip no matter how many players are at the table.
+"""
+
+import logging
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+SETTLE = "settle"
+
+
+def encode_settlement(round_id: int, payouts: Sequence[int]) -> str:
+    """Builds the settlement message for a round.
+
+    Args:
+        round_id: Id of the settled round.
+        payouts: Net payout of every seat in seat order, negative if the
+            player lost chips.
+
+    Returns:
+        str: Message like `"settle 3 100 -100 150"`.
+    """
+    return " ".join([SETTLE, str(round_id), *map(str, payouts)])
+
+
+def is_settlement(message: str) -> bool:
+    """Whether a message is a round settlement rather than a single payout."""
+    return message.startswith(SETTLE + " ")
+
+
+def decode_settlement(message: str) -> tuple[int, list[int]]:
+    """Parses a message built by `encode_settlement`.
+
+    Returns:
+        tuple[int, list[int]]: Round id and the payout of every seat.
+    """
+    tag, round_id, *payouts = message.split()
+    if tag != SETTLE:
+        raise ValueError(f"Not a settlement message: {message!r}")
+    return int(round_id), [int(p) for p in payouts]
+
+
+@dataclass(frozen=True)
+class Move:
+    """Chips one dispenser pushes to one seat."""
+
+    seat: int
+    chips: int
+
+
+@dataclass
+class SettlementPlan:
+    """Chip moves of one round grouped by dispenser motor id."""
+
+    round_id: int
+    chip_values: Mapping[int, int]  # motor id -> value of its chips
+    moves: dict[int, list[Move]] = field(default_factory=dict)
+    collected: dict[int, int] = field(default_factory=dict)  # seat -> amount
+    shortfall: dict[int, int] = field(default_factory=dict)  # seat -> amount
+
+    def chips(self, motor_id: int) -> int:
+        """Total chips a dispenser pushes this round."""
+        return sum(move.chips for move in self.moves.get(motor_id, []))
+
+    def paid(self) -> int:
+        """Total value of every chip in the plan."""
+        return sum(
+            self.chip_values[motor_id] * move.chips
+            for motor_id, moves in self.moves.items()
+            for move in moves
+        )
+
+    def summary(self) -> str:
+        """One line description used as the dispenser's reply."""
+        parts = [f"{motor_id}: {self.chips(motor_id)}" for motor_id in self.moves]
+        return (
+            f"Settled round {self.round_id}, paid ${self.paid()} "
+            f"({', '.join(parts) or 'no chips'}), "
+            f"collected ${sum(self.collected.values())}"
+        )
+
+
+def build_plan(
+    round_id: int,
+    payouts: Sequence[int],
+    chip_values: Mapping[int, int],
+) -> SettlementPlan:
+    """Splits a round's payouts into chips per dispenser.
+
+    Winning seats are paid with the fewest chips, largest values first. Losing
+    seats only record the amount collected from them.
+
+    Args:
+        round_id: Id of the settled round.
+        payouts: Net payout of every seat in seat order.
+        chip_values: Value of the chips loaded in each dispenser, by motor id.
+
+    Returns:
+        SettlementPlan: Moves grouped by dispenser.
+    """
+    plan = SettlementPlan(round_id, chip_values)
+    by_value = sorted(chip_values.items(), key=lambda item: item[1], reverse=True)
+    for seat, payout in enumerate(payouts):
+        if payout < 0:
+            plan.collected[seat] = -payout
+            continue
+        remaining = payout
+        for motor_id, value in by_value:
+            chips, remaining = divmod(remaining, value)
+            if chips:
+                plan.moves.setdefault(motor_id, []).append(Move(seat, chips))
+        if remaining:
+            logger.warning(
+                "Cannot pay $%d of seat %d's payout with the loaded chips",
+                remaining,
+                seat,
+            )
+            plan.shortfall[seat] = remaining
+    return plan
@@ -1,6 +1,7 @@
 """Main driver for DEALR stack."""
 
 import argparse
+import logging
 import threading
 import time
 from pathlib import Path
@@ -8,8 +9,23 @@ from pathlib import Path
 import tomli
 
 import dealr.blackjack.client as bj_client
+import dealr.card_detector.inference as cd_inference
+import dealr.card_detector.pipeline as cd_pipeline
 import dealr.card_detector.server as cd_server
+import dealr.dispenser.dispenser as ds_dispenser
 import dealr.dispenser.server as ds_server
+from dealr.dispenser.dispenser_core import Dispenser
+
+logger = logging.getLogger(__name__)
+
+
+def connect_dispensers() -> list[Dispenser]:
+    """Builds the chip dispensers, or none if their hardware is unavailable."""
+    try:
+        return ds_dispenser.make_dispensers()
+    except RuntimeError as e:
+        logger.warning("Chip dispensers unavailable, skipping settlement: %s", e)
+        return []
 
 
 def main() -> None:
@@ -17,20 +33,63 @@ def main() -> None:
 
     parser = argparse.ArgumentParser()
     parser.add_argument("--num-players", type=int, default=1, required=False)
+    parser.add_argument(
+        "--pickle-hands",
+        action="store_true",
+        help="send card detector hands in the old pickle format",
+    )
+    parser.add_argument("--camera", type=int, default=0)
+    parser.add_argument(
+        "--tags", action="store_true", help="read cards from AprilTags, not YOLO"
+    )
+    parser.add_argument(
+        "--backend",
+        choices=cd_inference.BACKENDS,
+        default="ultralytics",
+        help="card model inference backend",
+    )
+    parser.add_argument(
+        "--roi", action="store_true", help="detect cards in seat regions only"
+    )
+    parser.add_argument(
+        "--random-cards",
+        action="store_true",
+        help="publish random hands instead of running the camera",
+    )
     args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
 
     ports_file = Path.cwd() / "src" / "dealr" / "ports.toml"
     ports = tomli.loads(ports_file.read_text(encoding="utf-8"))
-    card_detector_pub = threading.Thread(
-        target=cd_server.serve,
-        args=(args.num_players, ports["card-detector"]),
-        daemon=True,
-    )
+    if args.random_cards:
+        card_detector_pub = threading.Thread(
+            target=cd_server.serve_random,
+            args=(args.num_players, ports["card-detector"]),
+            kwargs={"use_pickle": args.pickle_hands},
+            daemon=True,
+        )
+    else:
+        card_detector_pub = threading.Thread(
+            target=cd_server.serve,
+            args=(ports["card-detector"], args.camera),
+            kwargs={
+                "model_path": None if args.tags else cd_pipeline.MODEL_PATH,
+                "backend": args.backend,
+                "roi": args.roi,
+                "use_pickle": args.pickle_hands,
+            },
+            daemon=True,
+        )
     dispenser_server = threading.Thread(
-        target=ds_server.serve, args=(ports["dispenser"],), daemon=True
+        target=ds_server.serve,
+        args=(ports["dispenser"], connect_dispensers()),
+        daemon=True,
     )
     blackjack_logic = threading.Thread(
-        target=bj_client.serve, args=(args.num_players,), kwargs=ports, daemon=True
+        target=bj_client.serve,
+        args=(args.num_players,),
+        kwargs={"allow_pickle": args.pickle_hands, **ports},
+        daemon=True,
     )
 
     card_detector_pub.start()